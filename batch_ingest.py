@@ -0,0 +1,106 @@
+import io
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import NamedTuple, Optional
+
+import pandas as pd
+
+import processing
+
+
+INGEST_WORKERS = int(os.environ.get("DASHBOARD_INGEST_WORKERS", "0")) or os.cpu_count() or 1
+
+
+class BatchResult(NamedTuple):
+    name: str
+    dataset: Optional[processing.Dataset]
+    error: Optional[str]
+    seconds: float
+
+
+def _ingest(data, engine):
+    start = time.perf_counter()
+    dataset = processing.load_dataset(data if isinstance(data, str) else io.BytesIO(data), engine=engine)
+    return dataset, time.perf_counter() - start
+
+
+def ingest_workbooks(files, engine=None, max_workers=None):
+    """Parse workbooks in parallel worker processes, yielding a BatchResult per file as each finishes.
+
+    ``files`` is a list of (name, bytes or path). Excel parsing is CPU-bound Python that holds the GIL,
+    so it runs in processes rather than threads. Workers are spawned rather than forked, since
+    forking the multi-threaded Streamlit server is unsafe. A file that fails (including a worker
+    that crashes) produces a result with ``error`` set; the other files are unaffected.
+    """
+    if not files:
+        return
+    workers = min(max_workers or INGEST_WORKERS, len(files))
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {pool.submit(_ingest, data, engine): name for name, data in files}
+        for future in as_completed(futures):
+            try:
+                dataset, seconds = future.result()
+            except Exception as exc:
+                yield BatchResult(futures[future], None, str(exc) or type(exc).__name__, 0.0)
+            else:
+                yield BatchResult(futures[future], dataset, None, seconds)
+
+
+def _as_object(df):
+    # Categories differ between workbooks; concatenating them would fall back to object anyway.
+    return df.astype({column: object for column, dtype in df.dtypes.items() if isinstance(dtype, pd.CategoricalDtype)})
+
+
+def _add_up(frames, keys):
+    """Concatenate ``frames`` and sum numeric columns over rows with the same ``keys``.
+
+    Rows are matched by occurrence, so a key repeated within one workbook stays separate rather
+    than being folded into itself. Other columns keep their first value; row order follows first
+    appearance.
+    """
+    combined = pd.concat(
+        [_as_object(df).assign(_occurrence=df.groupby(keys, sort=False, observed=True, dropna=False).cumcount()) for df in frames],
+        ignore_index=True,
+    )
+    group_keys = keys + ["_occurrence"]
+    aggregations = {
+        column: "sum" if pd.api.types.is_numeric_dtype(combined[column]) else "first"
+        for column in combined.columns if column not in group_keys
+    }
+    result = combined.groupby(group_keys, sort=False, dropna=False).agg(aggregations).reset_index()
+    return result[list(frames[0].columns)]
+
+
+def combine_datasets(datasets):
+    """Add several workbooks up into one dataset, e.g. one workbook per vendor.
+
+    Total rows are summed per company label, trade rows per (company, trade) and location
+    counts per (company, trade, location, 30% value). Workbooks must resolve the same Summary
+    columns; headers are renamed to the first workbook's spelling.
+    """
+    base = datasets[0].col_map
+    missing = {key for key, column in base.items() if column is None}
+    aligned = []
+    for dataset in datasets:
+        if {key for key, column in dataset.col_map.items() if column is None} != missing:
+            raise ValueError("The workbooks do not have the same Summary columns, so they cannot be combined.")
+        rename = {dataset.col_map[key]: base[key] for key in base if base[key] is not None}
+        # The location table's other columns have fixed names ("Company", "Row Labels", ...) that
+        # a Summary header rename must not touch; only its 30% value header varies.
+        location_rename = {dataset.col_map["thirty_percent_value"]: base["thirty_percent_value"]}
+        aligned.append([
+            dataset.total_rows.rename(columns=rename),
+            dataset.trade_rows.rename(columns=rename),
+            dataset.location_final.rename(columns=location_rename),
+        ])
+    total_frames, trade_frames, location_frames = zip(*aligned)
+
+    total_rows = _add_up(total_frames, ["cleaned_company_label"])
+    trade_rows = _add_up(trade_frames, [base["company"], base["trade"]])
+    location_final = _add_up(location_frames, ["Company", "Row Labels", "Location", base["thirty_percent_value"]])
+
+    total_rows, trade_rows, memory = processing._compact_summary(total_rows, trade_rows, base)
+    location_final, memory["location_final"] = processing.compact_dtypes(location_final, processing.LOCATION_LABEL_COLUMNS)
+    return processing.Dataset(total_rows, trade_rows, dict(base), location_final, memory)
@@ -0,0 +1,78 @@
+"""Time a "View Breakdown" click: full-script rerun versus a rerun of one KPI-group fragment.
+
+    python benchmarks/bench_breakdown_toggle.py [--trades N] [--repeat R]
+
+Uses Streamlit's headless AppTest. The "full script" number is what every click used to cost
+(the old handler called st.rerun(), so a click actually paid for two of these); the fragment
+number is the work a click now does when the browser reruns just that group.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from streamlit.testing.v1 import AppTest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from synthetic_workbook import generate_workbook
+
+
+def fragment_app():
+    import os
+
+    import streamlit as st
+
+    from excel_to_dashboard import KPI_GROUPS, _load_workbook, render_kpi_group
+
+    if 'active_breakdown' not in st.session_state:
+        st.session_state.active_breakdown = {}
+    view = _load_workbook(os.environ["DASHBOARD_MASTER_PATH"])[1]["PTPL"]
+    group_title = next(iter(KPI_GROUPS))
+    render_kpi_group(view, group_title, KPI_GROUPS[group_title])
+
+
+def time_clicks(app, repeat):
+    app.run()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        app.button(key="btn_total_received").click().run()
+        samples.append(time.perf_counter() - start)
+        assert not app.exception, app.exception
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trades", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.xlsx")
+        generate_workbook(path, args.trades)
+        os.environ["DASHBOARD_MASTER_PATH"] = path
+        os.environ["DASHBOARD_CACHE_DIR"] = os.path.join(tmp, "cache")
+        os.environ["DASHBOARD_HISTORY_PATH"] = ""
+        sys.path.insert(0, ROOT)
+        os.chdir(ROOT)
+
+        full = AppTest.from_file(os.path.join(ROOT, "excel_to_dashboard.py"), default_timeout=600)
+        full.session_state["logged_in"] = True
+        full.session_state["user_info"] = {"role": "PTPL", "logo": "assets/ptpl.png"}
+        full.session_state["username"] = "pragyawan"
+        full_time = time_clicks(full, args.repeat)
+
+        fragment_time = time_clicks(AppTest.from_function(fragment_app, default_timeout=600), args.repeat)
+
+    print(f"{args.trades} trades, median of {args.repeat} clicks")
+    print(f"{'full-script rerun':<22}{full_time * 1000:>10.1f} ms")
+    print(f"{'fragment rerun':<22}{fragment_time * 1000:>10.1f} ms  ({full_time / fragment_time:.0f}x less work)")
+
+
+if __name__ == "__main__":
+    main()
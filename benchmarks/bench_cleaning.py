@@ -0,0 +1,92 @@
+"""Microbenchmarks for Summary cleaning and schema resolution on a synthetic 100k-row sheet.
+
+    python benchmarks/bench_cleaning.py [--rows N] [--repeat R]
+
+The "before" columns re-implement the per-row clean_text/str.contains path and the
+per-key find_column scan that load_and_process_data used to run.
+"""
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import time
+import unicodedata
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from processing import SUMMARY_COLUMNS, _match_headers, clean_labels, resolve_columns
+from synthetic_workbook import SUMMARY_HEADERS
+
+
+def clean_text(text):
+    text = str(text if pd.notna(text) else '')
+    text = unicodedata.normalize('NFKC', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.lower().strip()
+
+
+def find_column(pattern, df_columns):
+    for col in df_columns:
+        if re.search(pattern, str(col).lower()):
+            return col
+    return None
+
+
+def synthetic_labels(rows):
+    rng = random.Random(0)
+    vocabulary = ["PTPL", "VTL", "ITI", " PTPL  Total", "VTL Total", "ＩＴＩ Total", "Grand  Total", None]
+    return pd.Series([rng.choice(vocabulary) for _ in range(rows)], dtype=object)
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def before_labels(labels):
+    cleaned = labels.apply(clean_text)
+    return cleaned[cleaned.str.contains('total', na=False)], cleaned[~cleaned.str.contains('total', na=False)]
+
+
+def after_labels(labels):
+    cleaned = clean_labels(labels)
+    is_total = cleaned.str.contains('total', regex=False)
+    return cleaned[is_total], cleaned[~is_total]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    labels = synthetic_labels(args.rows)
+    assert labels.apply(clean_text).equals(clean_labels(labels))
+    headers = pd.Index(SUMMARY_HEADERS + [f"Unused {i}" for i in range(40)])
+    assert {k: find_column(p, headers) for k, p in SUMMARY_COLUMNS.items()} == resolve_columns(SUMMARY_COLUMNS, headers)
+
+    def resolve_cold():
+        _match_headers.cache_clear()
+        resolve_columns(SUMMARY_COLUMNS, headers)
+
+    cases = [
+        (f"clean + total split ({args.rows:,} rows)", lambda: before_labels(labels), lambda: after_labels(labels)),
+        ("schema resolution (cold)", lambda: {k: find_column(p, headers) for k, p in SUMMARY_COLUMNS.items()}, resolve_cold),
+        ("schema resolution (memoized)", lambda: {k: find_column(p, headers) for k, p in SUMMARY_COLUMNS.items()}, lambda: resolve_columns(SUMMARY_COLUMNS, headers)),
+    ]
+    print(f"{'case':<36}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+    for name, before, after in cases:
+        b, a = timed(before, args.repeat) * 1000, timed(after, args.repeat) * 1000
+        print(f"{name:<36}{b:>12.3f}{a:>12.3f}{b / a:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
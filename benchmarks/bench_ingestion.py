@@ -0,0 +1,67 @@
+"""Compare the original ingestion path (full ExcelFile + whole-sheet read_excel with openpyxl)
+against the ingestion layer with each installed engine.
+
+    python benchmarks/bench_ingestion.py [workbook.xlsx] [--trades N] [--repeat R]
+
+Without a workbook argument a synthetic one is generated in a temporary directory.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ingestion
+from processing import SUMMARY_COLUMNS
+from synthetic_workbook import generate_workbook
+
+
+def baseline(path):
+    xls = pd.ExcelFile(path)
+    pd.read_excel(xls, sheet_name="Summary", header=0)
+    pd.read_excel(xls, sheet_name="Location Wise", header=None)
+
+
+def layered(path, engine):
+    xls = ingestion.open_workbook(path, engine=engine)
+    ingestion.read_sheet(xls, ingestion.find_sheet_name("Summary", xls.sheet_names), header=0, column_patterns=SUMMARY_COLUMNS.values())
+    ingestion.read_sheet(xls, ingestion.find_sheet_name("Location Wise", xls.sheet_names), header=None)
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("workbook", nargs="?")
+    parser.add_argument("--trades", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.workbook
+        if path is None:
+            path = os.path.join(tmp, "synthetic.xlsx")
+            generate_workbook(path, args.trades, locations=40, junk_sheets=3, junk_rows=args.trades, unused_columns=20)
+
+        reference = timed(lambda: baseline(path), args.repeat)
+        print(f"{'path':<28}{'median s':>10}{'speedup':>10}")
+        print(f"{'baseline (openpyxl, full)':<28}{reference:>10.3f}{1:>10.1f}x")
+        for engine in ingestion.available_engines():
+            elapsed = timed(lambda: layered(path, engine), args.repeat)
+            print(f"{'ingestion (' + engine + ')':<28}{elapsed:>10.3f}{reference / elapsed:>10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Scaling benchmark: time and peak memory of every pipeline stage from 10 to 100k trades.
+
+    python benchmarks/run_benchmarks.py [--sizes 10 100 1000 10000 100000] [--repeat 3]
+                                        [--output results.jsonl] [--compare baseline.jsonl]
+
+Stages: parse (read the two sheets), clean (Summary cleaning and split), melt_merge (location
+tables), compact (dtype compaction), views (per-company views) and render (a headless
+AppTest run of main_dashboard for a company user, with the dataset already cached).
+
+Each stage is timed without tracing (median of --repeat runs) and then run once more under
+tracemalloc to record its peak allocation. Every result line carries the git commit, library
+versions and workbook parameters, so files written by --output on different commits can be
+compared with --compare. Generated workbooks are kept in benchmarks/.workbooks/ between runs.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import warnings
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WORKBOOK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".workbooks")
+
+# The dashboard's modules read these when they are imported, so they are set first: snapshots
+# go next to the generated workbooks, and benchmark workbooks stay out of the real history.
+os.environ["DASHBOARD_CACHE_DIR"] = os.path.join(WORKBOOK_DIR, "cache")
+os.environ["DASHBOARD_HISTORY_PATH"] = ""
+
+import ingestion
+import processing
+from synthetic_workbook import generate_workbook
+from views import build_company_views
+
+
+def workbook_for(trades, locations, junk_sheets):
+    os.makedirs(WORKBOOK_DIR, exist_ok=True)
+    path = os.path.join(WORKBOOK_DIR, f"trades{trades}-loc{locations}-junk{junk_sheets}.xlsx")
+    if not os.path.exists(path):
+        generate_workbook(path + ".tmp", trades, locations=locations, junk_sheets=junk_sheets)
+        os.replace(path + ".tmp", path)
+    return path
+
+
+def measure(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, statistics.median(samples), peak
+
+
+def pipeline_stages(path, engine):
+    """Yield (stage, callable) in order; each callable consumes the previous stage's output."""
+    state = {}
+
+    def parse():
+        xls = ingestion.open_workbook(path, engine=engine)
+        summary_sheet, location_sheet = processing._resolve_sheets(xls.sheet_names)
+        state["summary_raw"] = processing._read_summary(xls, summary_sheet)
+        state["location_raw"] = ingestion.read_sheet(xls, location_sheet, header=None)
+
+    def clean():
+        state["summary"] = processing.process_summary(state["summary_raw"])
+
+    def melt_merge():
+        state["location"] = processing.process_location(state["location_raw"])
+
+    def compact():
+        total_rows, trade_rows, col_map = state["summary"]
+        location_final, thirty_percent_col_name = state["location"]
+        total_rows, trade_rows, memory = processing._compact_summary(total_rows, trade_rows, col_map)
+        location_final, memory["location_final"] = processing.compact_dtypes(location_final, processing.LOCATION_LABEL_COLUMNS)
+        state["dataset"] = processing.Dataset(
+            total_rows, trade_rows, dict(col_map, thirty_percent_value=thirty_percent_col_name), location_final, memory
+        )
+
+    def views():
+        build_company_views(state["dataset"])
+
+    return [("parse", parse), ("clean", clean), ("melt_merge", melt_merge), ("compact", compact), ("views", views)]
+
+
+def render_time(path, repeat):
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    os.environ["DASHBOARD_MASTER_PATH"] = path
+    os.chdir(ROOT)  # the sidebar logos are relative paths
+    st.cache_resource.clear()  # the master watcher is a cached resource bound to the previous size's path
+    app = AppTest.from_file(os.path.join(ROOT, "excel_to_dashboard.py"), default_timeout=3600)
+    app.session_state["logged_in"] = True
+    app.session_state["user_info"] = {"role": "PTPL", "logo": "assets/ptpl.png"}
+    app.session_state["username"] = "pragyawan"
+    app.run()  # loads and caches the dataset
+    if app.exception:
+        raise RuntimeError(app.exception[0].value)
+    return measure(app.run, repeat)[1:]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as fh:
+        baseline = {(r["trades"], r["stage"]): r for r in map(json.loads, fh)}
+    print(f"\nCompared with {baseline_path}")
+    print(f"{'trades':>8}  {'stage':<11}{'time':>10}{'peak':>10}")
+    for r in results:
+        old = baseline.get((r["trades"], r["stage"]))
+        if old:
+            peak = f"{r['peak_bytes'] / old['peak_bytes']:.2f}x" if old.get("peak_bytes") and r.get("peak_bytes") is not None else "-"
+            print(f"{r['trades']:>8}  {r['stage']:<11}{r['seconds'] / old['seconds']:>9.2f}x{peak:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000, 100000])
+    parser.add_argument("--locations", type=int, default=20)
+    parser.add_argument("--junk-sheets", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--engine", default=None, help="Excel engine (default: the app's default)")
+    parser.add_argument("--max-render-trades", type=int, default=1000, help="skip the headless render above this size")
+    parser.add_argument("--output", help="append JSON lines to this file")
+    parser.add_argument("--compare", help="JSON lines file from an earlier run to compare against")
+    args = parser.parse_args()
+    warnings.simplefilter("ignore", FutureWarning)
+
+    engine = args.engine or ingestion.default_engine()
+    context = {
+        "commit": git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "engine": engine,
+        "python": platform.python_version(), "pandas": pd.__version__,
+        "locations": args.locations, "junk_sheets": args.junk_sheets,
+    }
+    results = []
+    print(f"{'trades':>8}  {'stage':<11}{'ms':>12}{'peak MB':>10}")
+    for trades in args.sizes:
+        path = workbook_for(trades, args.locations, args.junk_sheets)
+        for stage, fn in pipeline_stages(path, engine):
+            _, seconds, peak = measure(fn, args.repeat)
+            results.append(dict(context, trades=trades, stage=stage, seconds=seconds, peak_bytes=peak))
+        if trades <= args.max_render_trades:
+            seconds, peak = render_time(path, args.repeat)
+            results.append(dict(context, trades=trades, stage="render", seconds=seconds, peak_bytes=peak))
+        for r in results:
+            if r["trades"] == trades:
+                print(f"{trades:>8}  {r['stage']:<11}{r['seconds'] * 1000:>12.1f}{r['peak_bytes'] / 2**20:>10.1f}")
+
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as fh:
+            for r in results:
+                fh.write(json.dumps(r) + "\n")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Write synthetic workbooks in the layout processing.load_dataset expects.
+
+    python benchmarks/synthetic_workbook.py out.xlsx --trades 1000 --companies PTPL VTL ITI --locations 30 --junk-sheets 2 --unused-columns 10
+
+The workbook has a "Summary" sheet (one row per trade, a "<Company> Total" row after each
+company and a final "Grand Total"), a "Location Wise" sheet holding the received-count table
+and the pending-count table one below the other, and optional unrelated sheets. Totals are
+the exact sums of the trade rows, and zero location counts are left blank as in the pivot
+tables the real workbook is exported from. ``unused_columns`` appends Summary columns the
+dashboard never reads.
+"""
+import argparse
+
+import numpy as np
+from openpyxl import Workbook
+
+
+SUMMARY_HEADERS = [
+    "Company", "Row Labels", "Offered", "Received according to portal Total", "Pending according to portal Total",
+    "Count of 30% payment done", "Balance count as per vendor", "Sum of 30% payment received", "Balance 30 %",
+    "No. of delivery as per portal", "Difference between paid and delivery updated", "Sum of 70% payment received",
+    "Balance 70%",
+]
+
+TRADE_NAMES = ["Potter", "Washerman", "Metalsmith", "Sculptor", "Fishingnet", "Hammer", "Armourer", "Boatmaker", "Barber", "Carpenter", "Tailor", "Cobbler"]
+
+THIRTY_PERCENT_VALUE = 4500
+
+
+def _trade_labels(count):
+    if count <= len(TRADE_NAMES):
+        return TRADE_NAMES[:count]
+    return [f"{TRADE_NAMES[i % len(TRADE_NAMES)]} {i // len(TRADE_NAMES) + 1}" for i in range(count)]
+
+
+def _summary_values(rng, count):
+    offered = rng.integers(20, 2000, count)
+    paid_30 = (offered * rng.uniform(0.3, 1.0, count)).astype(np.int64)
+    delivered = (paid_30 * rng.uniform(0.5, 1.0, count)).astype(np.int64)
+    paid_70 = (delivered * rng.uniform(0.2, 1.0, count)).astype(np.int64)
+    amount_30 = paid_30 * THIRTY_PERCENT_VALUE
+    amount_70 = paid_70 * THIRTY_PERCENT_VALUE * 7 // 3
+    balance_30 = (offered - paid_30) * THIRTY_PERCENT_VALUE
+    balance_70 = (offered - paid_70) * THIRTY_PERCENT_VALUE * 7 // 3
+    return np.column_stack([
+        offered, amount_30 + amount_70, balance_30 + balance_70, paid_30, offered - paid_30,
+        amount_30, balance_30, delivered, paid_30 - delivered, amount_70, balance_70,
+    ])
+
+
+def _location_counts(rng, totals, locations):
+    # Spread each trade's total over a few locations; most cells stay empty.
+    counts = np.zeros((len(totals), locations), dtype=np.int64)
+    for row, total in enumerate(totals):
+        spots = rng.choice(locations, size=min(locations, 1 + int(rng.integers(0, 6))), replace=False)
+        counts[row, spots] = rng.multinomial(int(total), np.full(len(spots), 1 / len(spots)))
+    return counts
+
+
+def generate_workbook(path, trades=100, companies=("PTPL", "VTL", "ITI"), locations=20, junk_sheets=0, junk_rows=500, unused_columns=0, seed=0):
+    """Write the workbook to ``path``; ``trades`` is the total across companies."""
+    rng = np.random.default_rng(seed)
+    per_company = [trades // len(companies) + (1 if i < trades % len(companies) else 0) for i in range(len(companies))]
+    location_names = [f"District {i + 1}" for i in range(locations)]
+
+    workbook = Workbook(write_only=True)
+    for i in range(junk_sheets):
+        sheet = workbook.create_sheet(f"Notes {i + 1}")
+        sheet.append([f"Column {c}" for c in range(10)])
+        for row in rng.random((junk_rows, 10)).round(4).tolist():
+            sheet.append(row)
+
+    summary = workbook.create_sheet("Summary")
+    summary.append(SUMMARY_HEADERS + [f"Remarks {i + 1}" for i in range(unused_columns)])
+    filler = [0] * unused_columns
+    location_rows = {"received": [], "pending": []}
+    grand_total = np.zeros(len(SUMMARY_HEADERS) - 2, dtype=np.int64)
+    for company, count in zip(companies, per_company):
+        values = _summary_values(rng, count)
+        labels = _trade_labels(count)
+        for label, row in zip(labels, values.tolist()):
+            summary.append([company, label] + row + filler)
+        company_total = values.sum(axis=0)
+        summary.append([f"{company} Total", None] + company_total.tolist() + filler)
+        grand_total += company_total
+
+        received = _location_counts(rng, values[:, 3], locations)
+        pending = _location_counts(rng, values[:, 4], locations)
+        for name, counts in (("received", received), ("pending", pending)):
+            for label, row in zip(labels, counts.tolist()):
+                location_rows[name].append([company, label, THIRTY_PERCENT_VALUE] + [v or None for v in row])
+    summary.append(["Grand Total", None] + grand_total.tolist() + filler)
+
+    location = workbook.create_sheet("Location Wise")
+    header = ["Company", "Row Labels", "Thirty Percent Value"] + location_names
+    location.append(header)
+    for row in location_rows["received"]:
+        location.append(row)
+    location.append([])
+    location.append(header)
+    for row in location_rows["pending"]:
+        location.append(row)
+
+    workbook.save(path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--trades", type=int, default=100)
+    parser.add_argument("--companies", nargs="+", default=["PTPL", "VTL", "ITI"])
+    parser.add_argument("--locations", type=int, default=20)
+    parser.add_argument("--junk-sheets", type=int, default=0)
+    parser.add_argument("--junk-rows", type=int, default=500)
+    parser.add_argument("--unused-columns", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    generate_workbook(
+        args.path, args.trades, args.companies, args.locations, args.junk_sheets, args.junk_rows, args.unused_columns, args.seed
+    )
+
+
+if __name__ == "__main__":
+    main()
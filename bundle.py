@@ -0,0 +1,160 @@
+import datetime
+import json
+import math
+import os
+import shutil
+import tempfile
+
+import processing
+import snapshot_cache
+from views import build_company_views
+
+
+# Bump when the bundle layout changes. Bundles also record SNAPSHOT_VERSION, since the
+# tables inside them have the shape of the processing pipeline that wrote them.
+BUNDLE_VERSION = 1
+
+BUNDLE_PATH = os.environ.get("DASHBOARD_BUNDLE")
+
+_FRAMES = ("total_rows", "trade_rows", "location_final")
+
+
+class BundleError(ValueError):
+    pass
+
+
+def _plain(value):
+    # numpy scalars are not JSON serializable.
+    return value.item() if hasattr(value, "item") else value
+
+
+def _summarize_views(views):
+    kpis = {name: None if view.kpis is None else {key: _plain(v) for key, v in view.kpis.items()} for name, view in views.items()}
+    location_totals = {key: _plain(v) for key, v in next(iter(views.values())).location_totals.items()}
+    return kpis, location_totals
+
+
+def _entry_name(source, taken):
+    stem = os.path.splitext(os.path.basename(source))[0] or "workbook"
+    name, suffix = stem, 2
+    while name in taken:
+        name, suffix = f"{stem}-{suffix}", suffix + 1
+    taken.add(name)
+    return name
+
+
+def compile_bundle(directory, sources, engine=None):
+    """Process every workbook in ``sources`` and write a bundle at ``directory``, replacing any previous one.
+
+    Each workbook gets a sub-directory of Arrow tables (as in the snapshot cache); manifest.json
+    records the versions, each workbook's content fingerprint, col_map and per-company KPIs.
+    Nothing is written if any workbook fails to process; the BundleError names the workbook.
+    """
+    directory = os.path.abspath(directory)
+    os.makedirs(os.path.dirname(directory), exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f".{os.path.basename(directory)}-", dir=os.path.dirname(directory))
+    try:
+        workbooks, taken = [], set()
+        for source in sources:
+            try:
+                dataset = processing.process_workbook(source, engine=engine)
+                kpis, location_totals = _summarize_views(build_company_views(dataset))
+            except Exception as exc:
+                # Readers raise their own types for a corrupt or non-Excel file (CalamineError, BadZipFile, ...).
+                raise BundleError(f"'{source}' could not be processed: {exc}") from exc
+            name = _entry_name(source, taken)
+            frames = {frame: getattr(dataset, frame) for frame in _FRAMES}
+            if not snapshot_cache.write_frames(os.path.join(staging, name), frames, {"col_map": dataset.col_map, "memory": dataset.memory}):
+                raise BundleError(f"The tables of '{source}' could not be stored.")
+            workbooks.append({
+                "name": name,
+                "source": os.path.abspath(source),
+                "fingerprint": snapshot_cache.workbook_fingerprint(source),
+                "trades": len(dataset.trade_rows),
+                "kpis": kpis,
+                "location_totals": location_totals,
+            })
+        manifest = {
+            "bundle_version": BUNDLE_VERSION,
+            "snapshot_version": snapshot_cache.SNAPSHOT_VERSION,
+            "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "workbooks": workbooks,
+        }
+        with open(os.path.join(staging, "manifest.json"), "w", encoding="utf-8") as fh:
+            json.dump(manifest, fh, indent=2)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    # The app reads the bundle once at startup, so a brief gap between the two renames is harmless.
+    previous = None
+    if os.path.exists(directory):
+        previous = tempfile.mkdtemp(prefix=f".{os.path.basename(directory)}-old-", dir=os.path.dirname(directory))
+        os.rmdir(previous)
+        os.rename(directory, previous)
+    os.rename(staging, directory)
+    if previous:
+        shutil.rmtree(previous, ignore_errors=True)
+    return manifest
+
+
+def _read_manifest(directory):
+    try:
+        with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError) as exc:
+        raise BundleError(f"'{directory}' is not a readable dataset bundle: {exc}") from exc
+    versions = (manifest.get("bundle_version"), manifest.get("snapshot_version"))
+    if versions != (BUNDLE_VERSION, snapshot_cache.SNAPSHOT_VERSION):
+        raise BundleError(
+            f"The bundle at '{directory}' was written by a different version of the dashboard "
+            f"(bundle/snapshot version {versions}, expected {(BUNDLE_VERSION, snapshot_cache.SNAPSHOT_VERSION)}). Recompile it."
+        )
+    return [dict(entry, path=os.path.join(directory, entry["name"])) for entry in manifest.get("workbooks", [])]
+
+
+def load_bundle(directory):
+    """Read a bundle's manifest; returns {workbook fingerprint: entry}. Tables are read by read_dataset."""
+    return {entry["fingerprint"]: entry for entry in _read_manifest(directory)}
+
+
+def read_dataset(entry):
+    stored = snapshot_cache.read_frames(entry["path"])
+    if stored is None or any(frame not in stored[0] for frame in _FRAMES):
+        raise BundleError(f"The tables for '{entry['name']}' in the bundle are missing or unreadable.")
+    frames, meta = stored
+    return processing.Dataset(frames["total_rows"], frames["trade_rows"], meta["col_map"], frames["location_final"], meta["memory"])
+
+
+def _same(expected, actual):
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        return expected.keys() == actual.keys() and all(_same(expected[k], actual[k]) for k in expected)
+    if isinstance(expected, (int, float)) and isinstance(actual, (int, float)):
+        return (math.isnan(expected) and math.isnan(actual)) or math.isclose(expected, actual, rel_tol=1e-9, abs_tol=1e-9)
+    return expected == actual
+
+
+def check_bundle(directory):
+    """Validate a bundle; returns a list of problems, empty when it can be served.
+
+    Every table must load, the KPIs recomputed from the stored tables must match the ones
+    recorded at compile time, and a source workbook that still exists must not have changed.
+    """
+    try:
+        entries = _read_manifest(directory)
+    except BundleError as exc:
+        return [str(exc)]
+    problems = []
+    for entry in entries:
+        try:
+            views = build_company_views(read_dataset(entry))
+        except BundleError as exc:
+            problems.append(str(exc))
+            continue
+        kpis, location_totals = _summarize_views(views)
+        if not _same(entry["kpis"], kpis) or not _same(entry["location_totals"], location_totals):
+            problems.append(f"The KPIs stored for '{entry['name']}' do not match its tables.")
+        source = entry["source"]
+        if os.path.exists(source) and snapshot_cache.workbook_fingerprint(source) != entry["fingerprint"]:
+            problems.append(f"'{source}' has changed since '{entry['name']}' was compiled.")
+    return problems
@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, fields, is_dataclass
+from typing import Any, Optional
+
+import pandas as pd
+
+
+CACHE_BUDGET_MB = float(os.environ.get("DASHBOARD_CACHE_BUDGET_MB", "512"))
+CACHE_TTL_SECONDS = float(os.environ.get("DASHBOARD_CACHE_TTL_SECONDS", str(12 * 3600)))
+
+
+def estimate_size(value, _seen=None):
+    """Deep size in bytes of the DataFrames reachable from ``value``; each frame is counted once."""
+    seen = set() if _seen is None else _seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(value, pd.DataFrame) else usage)
+    if is_dataclass(value) and not isinstance(value, type):
+        return sum(estimate_size(getattr(value, f.name), seen) for f in fields(value))
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(item, seen) for item in value)
+    if hasattr(value, "values") and callable(value.values):
+        return sum(estimate_size(item, seen) for item in value.values())
+    return 0
+
+
+@dataclass
+class _Entry:
+    value: Any
+    size: int
+    loaded_at: float
+
+
+class DatasetCache:
+    """Process-wide LRU cache of processed workbooks with a memory budget and a TTL.
+
+    An entry can be pinned under a named slot (e.g. the shared master workbook); pinned entries
+    are never evicted, and pinning a new key to the same slot releases the previous one.
+
+    Loads are single-flight: while one caller is loading a key, concurrent callers for the same
+    key wait for that load and share its result (or its exception) instead of parsing again.
+    """
+
+    def __init__(self, budget_bytes, ttl_seconds=None, clock=time.monotonic):
+        self.budget_bytes = budget_bytes
+        self.ttl_seconds = ttl_seconds or None
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._pins = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.coalesced = 0
+
+    def get(self, key):
+        """Return the cached value for ``key``, or None; never loads."""
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def get_or_load(self, key, loader, pin_slot: Optional[str] = None):
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                if pin_slot is not None:
+                    self._pins[pin_slot] = key
+                return entry.value
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+                self._in_flight[key] = Future()
+        if future is not None:
+            value = future.result()
+            if pin_slot is not None:
+                with self._lock:
+                    self._pins[pin_slot] = key
+            return value
+        future = self._in_flight[key]
+
+        try:
+            value = loader()
+        except BaseException as exc:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(exc)
+            raise
+        entry = _Entry(value, estimate_size(value), self._clock())
+        with self._lock:
+            # Pin only after a successful load, so a broken file never releases a good entry.
+            if pin_slot is not None:
+                self._pins[pin_slot] = key
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._evict(keep=key)
+            del self._in_flight[key]
+        future.set_result(value)
+        return value
+
+    def _pinned_keys(self):
+        return set(self._pins.values())
+
+    def _expire(self):
+        if self.ttl_seconds is None:
+            return
+        pinned, now = self._pinned_keys(), self._clock()
+        for key in [k for k, e in self._entries.items() if k not in pinned and now - e.loaded_at > self.ttl_seconds]:
+            del self._entries[key]
+            self.evictions += 1
+
+    def _evict(self, keep):
+        pinned = self._pinned_keys()
+        total = sum(e.size for e in self._entries.values())
+        # Oldest first; the entry just loaded is kept even if it alone exceeds the budget.
+        for key in list(self._entries):
+            if total <= self.budget_bytes:
+                break
+            if key in pinned or key == keep:
+                continue
+            total -= self._entries.pop(key).size
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            pinned = self._pinned_keys()
+            return {
+                "entries": len(self._entries),
+                "pinned": sum(1 for key in self._entries if key in pinned),
+                "bytes": sum(e.size for e in self._entries.values()),
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "coalesced": self.coalesced,
+                "loading": len(self._in_flight),
+            }
@@ -1,7 +1,24 @@
-import streamlit as st
+import contextlib
+import os
+import time
+
 import pandas as pd
-import re
-import unicodedata
+import streamlit as st
+
+import batch_ingest
+import bundle
+import ingestion
+import instrumentation
+import snapshot_cache
+from dataset_cache import CACHE_BUDGET_MB, CACHE_TTL_SECONDS, DatasetCache
+from history_store import HISTORY_PATH, HistoryStore
+from instrumentation import metrics, span, timed
+from master_watcher import MasterDataWatcher
+from processing import load_dataset
+from views import COMPANY_OPTIONS, KPI_GROUPS, KPI_METRICS, LOCATION_METRICS, build_company_views
+
+# st.fragment graduated from experimental in newer Streamlit releases.
+fragment = getattr(st, "fragment", None) or st.experimental_fragment
 
 st.set_page_config(layout="wide", page_title="Trade Dashboard", page_icon="📊")
 
@@ -72,97 +89,441 @@ USERS = {
 }
 
 
-def find_column(pattern, df_columns):
-    for col in df_columns:
-        if re.search(pattern, str(col).lower()):
-            return col
-    return None
+MASTER_DATA_PATH = os.environ.get("DASHBOARD_MASTER_PATH", "assets/master_data.xlsx")
 
 
-@st.cache_data
-def load_and_process_data(uploaded_file):
-    xls = pd.ExcelFile(uploaded_file)
-    
-    def find_sheet_name(pattern, sheet_list):
-        pattern_lower = pattern.lower().strip()
-        for name in sheet_list:
-            if pattern_lower in name.lower().strip():
-                return name
-        return None
+@st.cache_resource
+def _dataset_cache():
+    return DatasetCache(CACHE_BUDGET_MB * 2**20, CACHE_TTL_SECONDS)
 
-    all_sheet_names = xls.sheet_names
-    summary_sheet = find_sheet_name("Summary", all_sheet_names)
-    location_sheet = find_sheet_name("Location Wise", all_sheet_names)
 
-    if not summary_sheet: raise ValueError(f"Could not find the 'Summary' sheet. Available sheets are: {all_sheet_names}")
-    if not location_sheet: raise ValueError(f"Could not find the 'Location Wise' sheet. Available sheets are: {all_sheet_names}")
+@st.cache_resource
+def _precompiled():
+    # Workbooks processed ahead of time by precompile.py, keyed by content fingerprint. A bundle
+    # that cannot be used is reported under Diagnostics and workbooks are parsed as usual.
+    if not bundle.BUNDLE_PATH:
+        return {}, None
+    try:
+        return bundle.load_bundle(bundle.BUNDLE_PATH), None
+    except bundle.BundleError as exc:
+        return {}, exc
 
-    df_summary = pd.read_excel(xls, sheet_name=summary_sheet, header=0)
-    df_location_raw = pd.read_excel(xls, sheet_name=location_sheet, header=None)
-    
-    col_map = {
-        "company": find_column(r'company', df_summary.columns), "trade": find_column(r'row labels', df_summary.columns),
-        "offered": find_column(r'offered', df_summary.columns), "total_received": find_column(r'received according to portal total', df_summary.columns),
-        "total_pending": find_column(r'pending according to portal total', df_summary.columns), "payment_30_count": find_column(r'count of 30% payment done', df_summary.columns),
-        "balance_count": find_column(r'balance count as per vendor', df_summary.columns), "payment_30_amount": find_column(r'sum of 30% payment received', df_summary.columns),
-        "balance_30": find_column(r'balance 30 %', df_summary.columns), "delivery": find_column(r'no. of delivery as per portal', df_summary.columns),
-        "pending_delivery": find_column(r'difference between paid and delivery updated', df_summary.columns), "payment_70_amount": find_column(r'sum of 70% payment received', df_summary.columns),
-        "balance_70": find_column(r'balance 70%', df_summary.columns), 
-    }
-    
-    def clean_text(text):
-        text = str(text if pd.notna(text) else '')
-        text = unicodedata.normalize('NFKC', text)
-        text = re.sub(r'\s+', ' ', text)
-        return text.lower().strip()
-
-    df = df_summary.copy()
-    df['cleaned_company_label'] = df[col_map["company"]].apply(clean_text)
-    
-    numeric_cols = list(col_map.keys())[2:]
-    for key in numeric_cols:
-        if col_map[key] and col_map[key] in df.columns:
-            df[col_map[key]] = pd.to_numeric(df[col_map[key]], errors='coerce')
-    df.fillna(0, inplace=True)
-    
-    total_rows = df[df['cleaned_company_label'].str.contains('total', na=False)]
-    trade_rows = df[~df['cleaned_company_label'].str.contains('total', na=False)]
-    
-    split_index = df_location_raw[df_location_raw.iloc[:, 0] == 'Company'].index
-    if len(split_index) < 2: raise ValueError("Could not find two separate tables in 'Location Wise' sheet.")
-    
-    received_df_raw = df_location_raw.iloc[:split_index[1]].dropna(how='all')
-    pending_df_raw = df_location_raw.iloc[split_index[1]:].dropna(how='all')
-    
-    def process_location_table(df_raw, value_name):
-        df_raw.columns = df_raw.iloc[0]
-        df_raw = df_raw[1:].dropna(subset=[df_raw.columns[0]])
-        
-        thirty_percent_val_col = find_column(r'thirty', df_raw.columns)
-        if not thirty_percent_val_col:
-            raise ValueError(f"Required column 'Thirty' not found in the 'Location Wise' sheet.")
 
-        id_vars = [df_raw.columns[0], df_raw.columns[1], thirty_percent_val_col]
-        location_vars = [col for col in df_raw.columns if col not in id_vars]
-        
-        df_tidy = df_raw.melt(id_vars=id_vars, value_vars=location_vars, var_name="Location", value_name=value_name)
-        df_tidy[value_name] = pd.to_numeric(df_tidy[value_name], errors='coerce').fillna(0)
-        df_tidy = df_tidy[df_tidy[value_name] > 0]
-        return df_tidy, thirty_percent_val_col
+@st.cache_resource
+def _history():
+    return HistoryStore(HISTORY_PATH) if HISTORY_PATH else None
 
-    received_tidy, _ = process_location_table(received_df_raw, "Received Count")
-    pending_tidy, thirty_percent_col_name = process_location_table(pending_df_raw, "Pending Count")
 
-    location_final = pd.merge(received_tidy, pending_tidy, on=['Company', 'Row Labels', 'Location', thirty_percent_col_name], how='outer').fillna(0)
-    
-    col_map['thirty_percent_value'] = thirty_percent_col_name
+def _source_name(uploaded_file):
+    return getattr(uploaded_file, "name", None) or os.path.basename(os.fspath(uploaded_file))
+
+
+def _with_views(dataset):
+    with span("build_company_views"):
+        return dataset, build_company_views(dataset)
+
+
+def _record(history, source, fingerprint, workbook, recorded=None):
+    # Every load is recorded, cache hit or not, so a workbook that goes back to an earlier
+    # version is the latest snapshot again; the store ignores a repeat of the latest version.
+    # ``recorded`` holds what a session recorded last, so its reruns do not touch the database.
+    if history is None or (recorded is not None and recorded.get(source) == fingerprint):
+        return
+    with span("record_history"):
+        history.record(source, fingerprint, *workbook)
+    if recorded is not None:
+        recorded[source] = fingerprint
+
+
+def _load_into(cache, uploaded_file, precompiled, history, recorded=None):
+    # Keyed on the workbook content hash, so replacing the file invalidates the entry. Below
+    # this, per-sheet snapshots on disk let a restarted worker (or a re-upload that touched
+    # only one sheet) skip most or all of the Excel parse. Sessions that ask for a workbook
+    # while another session is parsing it wait for that parse rather than starting their own.
+    # Entries are shared by reference between sessions, so nothing downstream may modify them.
+    fingerprint = snapshot_cache.workbook_fingerprint(uploaded_file)
+    pin_slot = "master" if uploaded_file == MASTER_DATA_PATH else None
+
+    def load():
+        if fingerprint in precompiled:
+            with span("read_bundle"):
+                dataset = bundle.read_dataset(precompiled[fingerprint])
+        else:
+            with span("load_dataset"):
+                dataset = load_dataset(uploaded_file)
+        return _with_views(dataset)
 
-    return total_rows, trade_rows, col_map, location_final
+    workbook = cache.get_or_load(fingerprint, load, pin_slot=pin_slot)
+    _record(history, _source_name(uploaded_file), fingerprint, workbook, recorded)
+    return workbook
 
 
+def _recorded():
+    return st.session_state.setdefault("history_recorded", {})
+
+
+def _load_workbook(uploaded_file):
+    return _load_into(_dataset_cache(), uploaded_file, _precompiled()[0], _history(), _recorded())
+
+
+@st.cache_resource
+def _master_watcher():
+    # The watcher thread has no script context, so it gets the cache object itself rather
+    # than going through the st.cache_resource accessor. It only loads a changed file, so
+    # every load it makes is recorded.
+    cache, precompiled, history = _dataset_cache(), _precompiled()[0], _history()
+    return MasterDataWatcher(MASTER_DATA_PATH, lambda path: _load_into(cache, path, precompiled, history)).start()
+
+
+BATCH_COMBINED = "All workbooks combined"
+
+
+def render_batch_upload():
+    """Admin batch mode: parse many workbooks in parallel processes, then show one of them or their sum."""
+    uploaded_files = st.file_uploader(
+        "Upload Excel files to process together", type=["xlsx", "xls"], accept_multiple_files=True, key="batch_files"
+    )
+    if not uploaded_files:
+        return None
+    cache, precompiled, history, recorded = _dataset_cache(), _precompiled()[0], _history(), _recorded()
+    # Failures are remembered per session so a broken file is not re-parsed on every rerun.
+    failed = st.session_state.setdefault("batch_errors", {})
+    # Workbooks are keyed by content fingerprint, since two uploads can share a file name. The
+    # name is only a label, numbered when it repeats, and the history records each under its label.
+    labels, ready, pending = {}, {}, []
+    for uploaded_file in uploaded_files:
+        fingerprint = snapshot_cache.workbook_fingerprint(uploaded_file)
+        if fingerprint in labels:
+            continue
+        label, copy = uploaded_file.name, 1
+        while label in labels.values():
+            copy += 1
+            label = f"{uploaded_file.name} ({copy})"
+        labels[fingerprint] = label
+        if fingerprint in failed:
+            continue
+        try:
+            ingestion.check_upload_size(uploaded_file)
+        except ingestion.UploadTooLarge as exc:
+            failed[fingerprint] = str(exc)
+            continue
+        workbook = cache.get(fingerprint)
+        if workbook is None and fingerprint in precompiled:
+            workbook = _load_into(cache, uploaded_file, precompiled, None)
+        if workbook is None:
+            pending.append((uploaded_file, fingerprint))
+        else:
+            _record(history, label, fingerprint, workbook, recorded)
+            ready[fingerprint] = workbook
+
+    if pending:
+        with st.status(f"Processing {len(pending)} workbook(s) on up to {min(batch_ingest.INGEST_WORKERS, len(pending))} cores...", expanded=True) as status, contextlib.ExitStack() as spools:
+            progress = st.progress(0.0)
+            # Large workbooks reach the workers as a spooled file instead of a pickled copy of their bytes.
+            files = [
+                (fingerprint, spools.enter_context(ingestion.spooled(f)) if ingestion.wants_streaming(f) else f.getvalue()) for f, fingerprint in pending
+            ]
+            with span("batch_ingest"):
+                results = batch_ingest.ingest_workbooks(files)
+                for done, result in enumerate(results, 1):
+                    fingerprint = result.name
+                    if result.error:
+                        failed[fingerprint] = result.error
+                        st.write(f"❌ {labels[fingerprint]}: {result.error}")
+                    else:
+                        workbook = cache.get_or_load(fingerprint, lambda r=result: _with_views(r.dataset))
+                        _record(history, labels[fingerprint], fingerprint, workbook, recorded)
+                        ready[fingerprint] = workbook
+                        st.write(f"✅ {labels[fingerprint]}: {len(result.dataset.trade_rows)} trade rows in {result.seconds:.1f}s")
+                    progress.progress(done / len(pending), text=f"{done} of {len(pending)} processed")
+            state = "error" if any(fingerprint in failed for _, fingerprint in pending) else "complete"
+            status.update(label=f"Processed {len(pending)} workbook(s)", state=state, expanded=False)
+
+    errors = [f"{labels[fingerprint]}: {error}" for fingerprint, error in failed.items() if fingerprint in labels]
+    if errors:
+        st.warning("These files could not be processed and are left out:\n\n" + "\n\n".join(errors))
+    if not ready:
+        st.stop()
+
+    choices = [fingerprint for fingerprint in labels if fingerprint in ready]
+    options = choices + [BATCH_COMBINED] if len(choices) > 1 else choices
+    choice = st.sidebar.selectbox("Workbook", options, format_func=lambda option: labels.get(option, option), key="batch_choice")
+    # The combined view is not recorded in the history, so Trends falls back to the first workbook.
+    st.session_state["batch_source"] = labels.get(choice)
+    if choice != BATCH_COMBINED:
+        return ready[choice]
+    combined_key = "combined-" + "-".join(sorted(choices))
+
+    def combine():
+        dataset = batch_ingest.combine_datasets([ready[fingerprint][0] for fingerprint in choices])
+        return dataset, build_company_views(dataset)
+
+    try:
+        return cache.get_or_load(combined_key, combine)
+    except Exception as e:
+        # This runs outside main_dashboard's error handling, so any failure is reported here.
+        st.error(f"The workbooks could not be combined: {e}")
+        st.stop()
+
+
+def render_diagnostics(dataset):
+    with st.sidebar.expander("Diagnostics"):
+        watcher = _master_watcher()
+        if watcher.loaded_at:
+            st.caption(f"Master data loaded at {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(watcher.loaded_at))}.")
+        if watcher.last_error:
+            st.warning(f"The latest master data file was rejected and the previous version is still served: {watcher.last_error}")
+        history = _history()
+        if history is not None and history.last_error:
+            st.warning(f"The latest workbook could not be added to the history: {history.last_error}")
+        precompiled, bundle_error = _precompiled()
+        if bundle_error:
+            st.warning(f"The precompiled bundle is not used: {bundle_error}")
+        elif precompiled:
+            st.caption(f"{len(precompiled)} precompiled workbook(s) available from {bundle.BUNDLE_PATH}.")
+        stats = _dataset_cache().stats()
+        st.caption("Dataset cache")
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Hits", stats["hits"])
+        c2.metric("Misses", stats["misses"])
+        c3.metric("Evictions", stats["evictions"])
+        st.write(
+            f"{stats['entries']} cached workbook(s), {stats['pinned']} pinned: "
+            f"{stats['bytes'] / 2**20:,.1f} MB of {stats['budget_bytes'] / 2**20:,.0f} MB budget. "
+            f"{stats['coalesced']} request(s) shared an in-flight load; {stats['loading']} loading now."
+        )
+        st.caption("Memory use of the processed frames, before and after dtype compaction.")
+        rows = [
+            {"Frame": name, "Before (MB)": usage["before"] / 2**20, "After (MB)": usage["after"] / 2**20,
+             "Saved": f"{1 - usage['after'] / usage['before']:.0%}" if usage["before"] else "-"}
+            for name, usage in dataset.memory.items()
+        ]
+        col_config = {"Before (MB)": st.column_config.NumberColumn(format="%.3f"), "After (MB)": st.column_config.NumberColumn(format="%.3f")}
+        st.dataframe(rows, use_container_width=True, hide_index=True, column_config=col_config)
+        render_stage_metrics()
+
+
+def render_stage_metrics():
+    if not instrumentation.METRICS_ENABLED:
+        st.caption("Set DASHBOARD_METRICS=1 (or =memory to also trace allocations) to record per-stage timings.")
+        return
+    stages, counters = metrics.snapshot()
+    st.caption(
+        f"Stage timings since the server started. Sheet snapshots reused: {counters.get('snapshot_hits', 0)}, "
+        f"parsed: {counters.get('snapshot_misses', 0)}."
+    )
+    rows = []
+    for name, stats in stages.items():
+        row = {"Stage": name, "Calls": stats.calls, "Last (ms)": stats.last_seconds * 1000,
+               "Mean (ms)": stats.total_seconds / stats.calls * 1000, "Max (ms)": stats.max_seconds * 1000}
+        if instrumentation.TRACE_MEMORY:
+            row["Peak (MB)"] = stats.peak_bytes / 2**20
+        rows.append(row)
+    col_config = {column: st.column_config.NumberColumn(format="%.1f") for column in ["Last (ms)", "Mean (ms)", "Max (ms)", "Peak (MB)"]}
+    st.dataframe(rows, use_container_width=True, hide_index=True, column_config=col_config)
+
+
+def export_metrics():
+    stats = _dataset_cache().stats()
+    counters = {f"dataset_cache_{name}": stats[name] for name in ("hits", "misses", "evictions", "coalesced")}
+    gauges = {f"dataset_cache_{name}": stats[name] for name in ("entries", "pinned", "bytes", "budget_bytes", "loading")}
+    metrics.export(counters=counters, gauges=gauges)
+
+
+TRADE_EMOJIS = {'potter': '🏺', 'washerman': '🧺', 'metalsmith': '⚙️', 'sculptor': '🗿', 'fishingnet': '🕸️', 'hammer': '🔨', 'armourer': '🛡️', 'boatmaker': '🚤', 'barber': '💈', 'default': '🔧'}
+TRADE_PAGE_SIZES = [10, 25, 50]
+
+
+def _toggle_breakdown(group_title, kpi_key):
+    active = st.session_state.active_breakdown
+    active[group_title] = None if active.get(group_title) == kpi_key else kpi_key
+
+
+@fragment
+@timed("render_kpi_group")
+def render_kpi_group(view, group_title, kpis):
+    # Rendered as a fragment: a "View Breakdown"/"Close" click reruns only this group's cards and
+    # panel, not the whole script (login, theme, data lookup and the other tabs).
+    col_map = view.col_map
+    active_key = st.session_state.active_breakdown.get(group_title)
+    st.subheader(group_title)
+    cols = st.columns(len(kpis))
+    for i, kpi in enumerate(kpis):
+        with cols[i]:
+            st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+            value = view.kpis[kpi.key]
+            st.metric(label=kpi.label, value=kpi.metric_format.format(value))
+            button_label = "Close" if active_key == kpi.key else "View Breakdown"
+            st.button(button_label, key=f"btn_{kpi.key}", use_container_width=True, on_click=_toggle_breakdown, args=(group_title, kpi.key))
+            st.markdown('</div>', unsafe_allow_html=True)
+    active_kpi_in_group = next((k for k in kpis if k.key == active_key), None)
+    if active_kpi_in_group:
+        with st.container():
+            st.markdown('<div class="breakdown-container">', unsafe_allow_html=True)
+            st.markdown(f"#### Breakdown for: **{active_kpi_in_group.label}**")
+            metric_col, trade_col, company_col = col_map.get(active_kpi_in_group.source), col_map.get('trade'), col_map.get('company')
+            cols_to_show, rename_map = [trade_col], {trade_col: "Trade"}
+            if view.name == "Combined":
+                cols_to_show.append(company_col)
+                rename_map[company_col] = "Company"
+            cols_to_show.append(metric_col)
+            rename_map[metric_col] = active_kpi_in_group.label
+            breakdown_df = view.trades[cols_to_show].copy().rename(columns=rename_map)
+            col_config = { active_kpi_in_group.label: st.column_config.NumberColumn(format=active_kpi_in_group.df_format) }
+            st.dataframe(breakdown_df, use_container_width=True, column_config=col_config, hide_index=True)
+            st.markdown('</div>', unsafe_allow_html=True)
+
+
+def _render_trade_table(trades, col_map, combined):
+    trade_col, company_col = col_map["trade"], col_map["company"]
+    columns, rename_map = [trade_col], {trade_col: "Trade"}
+    if combined:
+        columns.append(company_col)
+        rename_map[company_col] = "Company"
+    col_config = {}
+    for kpi in KPI_METRICS:
+        if col_map.get(kpi.source) is not None:
+            columns.append(col_map[kpi.source])
+            rename_map[col_map[kpi.source]] = kpi.label
+            col_config[kpi.label] = st.column_config.NumberColumn(format=kpi.df_format)
+    st.dataframe(trades[columns].rename(columns=rename_map), use_container_width=True, hide_index=True, column_config=col_config)
+
+
+def _render_trade_card(row, col_map, combined):
+    trade_name = str(row[col_map["trade"]]).strip()
+    company_name = row.get(col_map["company"], "")
+    emoji = TRADE_EMOJIS.get(trade_name.lower(), TRADE_EMOJIS['default'])
+    expander_title = f"{emoji} {trade_name}"
+    if combined and company_name:
+        expander_title += f" ({company_name})"
+    with st.expander(expander_title):
+        for group_title, kpis in KPI_GROUPS.items():
+            st.markdown(f"**{group_title.split(' ')[0]}**")
+            cols = st.columns(len(kpis))
+            for i, kpi in enumerate(kpis):
+                with cols[i]:
+                    value = row.get(col_map.get(kpi.source), 0)
+                    st.metric(label=kpi.label, value=kpi.metric_format.format(value))
+            st.divider()
+
+
+@fragment
+@timed("render_trade_details")
+def render_trade_details(view):
+    # Search, filtering and paging happen here on the server, and only the current page of
+    # cards is sent to the browser, so the element count per rerun is bounded by the page size
+    # however many trades the workbook has. As a fragment, paging does not rerun the other tabs.
+    col_map, combined = view.col_map, view.name == "Combined"
+    trades = view.trades
+    trades = trades[trades[col_map["trade"]].astype(str).str.strip() != ""]
+
+    search_col, filter_col, layout_col = st.columns([3, 2, 2])
+    query = search_col.text_input("Search trades", key="trade_search", placeholder="Trade name").strip()
+    companies = []
+    if combined:
+        companies = filter_col.multiselect("Company", sorted(trades[col_map["company"]].astype(str).unique()), key="trade_company_filter")
+    layout = layout_col.radio("Layout", ["Cards", "Table"], key="trade_layout", horizontal=True)
+
+    if query:
+        trades = trades[trades[col_map["trade"]].astype(str).str.contains(query, case=False, regex=False)]
+    if companies:
+        trades = trades[trades[col_map["company"]].astype(str).isin(companies)]
+    if trades.empty:
+        st.info("No trades match the current search and filters.")
+        return
+
+    if layout == "Table":
+        _render_trade_table(trades, col_map, combined)
+        return
+
+    size_col, page_col = st.columns(2)
+    page_size = size_col.selectbox("Trades per page", TRADE_PAGE_SIZES, key="trade_page_size")
+    page_count = -(-len(trades) // page_size)
+    # The stored page can be past the end after the filters narrow the list.
+    if st.session_state.get("trade_page", 1) > page_count:
+        st.session_state.trade_page = page_count
+    page = page_col.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, step=1, key="trade_page")
+    start = (page - 1) * page_size
+    page_trades = trades.iloc[start:start + page_size]
+    st.caption(f"Showing trades {start + 1}–{start + len(page_trades)} of {len(trades)}")
+    for _, row in page_trades.iterrows():
+        _render_trade_card(row, col_map, combined)
+
+
+TREND_METRICS = ["total_received", "total_pending", "balance_30", "balance_70"]
+KPI_BY_KEY = {kpi.key: kpi for kpi in KPI_METRICS}
+
+
+@fragment
+@timed("render_trends")
+def render_trends(view, history, source, choose_source):
+    # Everything here is read from the history store's pre-aggregated tables; no workbook is
+    # re-parsed, however many versions have been kept.
+    if choose_source:
+        sources = history.sources()
+        if not sources:
+            st.info("No workbook has been recorded in the history yet.")
+            return
+        source = st.selectbox("Workbook", sources, index=sources.index(source) if source in sources else 0, key="trend_source")
+    snapshots = history.snapshots(source)
+    if len(snapshots) < 2:
+        st.info("Trends appear once at least two different versions of this workbook have been loaded.")
+        return
+    ids, taken_at = snapshots["id"].tolist(), snapshots["taken_at"].tolist()
+    version_label = lambda i: f"Version {i + 1} ({taken_at[i]})"
+
+    st.subheader("Period over Period")
+    c1, c2 = st.columns(2)
+    current = c1.selectbox("Period", range(len(ids)), index=len(ids) - 1, format_func=version_label, key="trend_current")
+    previous = c2.selectbox("Compared with", range(len(ids)), index=len(ids) - 2, format_func=version_label, key="trend_previous")
+
+    series = history.company_series(source, view.name, TREND_METRICS)
+    now_totals, before_totals = history.location_totals(ids[current], view.name), history.location_totals(ids[previous], view.name)
+    cols = st.columns(len(TREND_METRICS) + 1)
+    for col, key in zip(cols, TREND_METRICS):
+        kpi = KPI_BY_KEY[key]
+        now, before = series[key].get(ids[current]), series[key].get(ids[previous])
+        if now is None or before is None or pd.isna(now) or pd.isna(before):
+            col.metric(kpi.label, "-")
+            continue
+        # Received going up is good; pending and balances going up is not.
+        col.metric(kpi.label, kpi.metric_format.format(now), delta=kpi.metric_format.format(now - before),
+                   delta_color="normal" if key == "total_received" else "inverse")
+    pending_change = now_totals["pending_count"] - before_totals["pending_count"]
+    cols[-1].metric("30% Payments Pending (Count)", f"{int(now_totals['pending_count']):,}", delta=f"{int(pending_change):,}", delta_color="inverse")
+
+    metric = st.selectbox("Largest changes by trade in", TREND_METRICS, format_func=lambda key: KPI_BY_KEY[key].label, key="trend_metric")
+    company = None if view.name == "Combined" else view.name
+    changes = history.trade_changes(ids[current], ids[previous], metric, company)
+    changes = changes.rename(columns={"company": "Company", "trade": "Trade", "current": "Period", "previous": "Compared with", "change": "Change"})
+    if company is not None:
+        changes = changes.drop(columns="Company")
+    number = st.column_config.NumberColumn(format=KPI_BY_KEY[metric].df_format)
+    st.dataframe(changes, use_container_width=True, hide_index=True,
+                 column_config={"Period": number, "Compared with": number, "Change": number})
+
+    st.subheader("Over Time")
+    labels = {key: KPI_BY_KEY[key].label for key in TREND_METRICS}
+    st.line_chart(series.set_index("taken_at").rename(columns=labels))
+    trade_col, location_col = st.columns(2)
+    with trade_col:
+        trades = history.trades(ids[current], company)
+        if trades:
+            trade = st.selectbox("Trade", trades, format_func=lambda t: f"{t[1]} ({t[0]})" if company is None else t[1], key="trend_trade")
+            trade_series = history.trade_series(source, trade[0], trade[1], TREND_METRICS)
+            st.line_chart(trade_series.set_index("taken_at").rename(columns=labels))
+    with location_col:
+        locations = history.locations(ids[current], view.name)
+        if locations:
+            location = st.selectbox("Location", locations, key="trend_location")
+            location_series = history.location_series(source, view.name, location).set_index("taken_at")[["received_count", "pending_count"]]
+            st.line_chart(location_series.rename(columns={"received_count": "Received Count", "pending_count": "Pending Count"}))
+
+
+@timed("main_dashboard")
 def main_dashboard(user_info):
     if 'active_breakdown' not in st.session_state:
-        st.session_state.active_breakdown = None
+        st.session_state.active_breakdown = {}
     
     user_role = user_info['role']
     username = st.session_state['username']
@@ -183,10 +544,9 @@ def main_dashboard(user_info):
     
     
     if user_role == 'admin':
-        company_options = ["Combined", "PTPL", "VTL", "ITI"]
         selected_view = st.sidebar.selectbox(
             "Filter by Company", 
-            company_options, 
+            COMPANY_OPTIONS, 
             index=0, 
             key="admin_view_selector"
         )
@@ -316,123 +676,80 @@ def main_dashboard(user_info):
         st.session_state.pop('user_info', None)
         st.session_state.pop('username', None)
         st.session_state.pop('active_breakdown', None)
+        st.session_state.pop('batch_errors', None)
         st.rerun()
 
     
     uploaded_file = None
+    workbook = None
     if user_role == 'admin':
-        uploaded_file = st.file_uploader("Upload your Excel file for an automated analysis", type=["xlsx", "xls"])
+        if st.sidebar.toggle("Batch upload", key="batch_mode", help="Upload many workbooks and process them in parallel."):
+            workbook = render_batch_upload()
+        else:
+            uploaded_file = st.file_uploader("Upload your Excel file for an automated analysis", type=["xlsx", "xls"])
+            if uploaded_file is not None:
+                try:
+                    ingestion.check_upload_size(uploaded_file)
+                except ingestion.UploadTooLarge as exc:
+                    st.error(str(exc))
+                    st.stop()
     else:
-        default_file_path = "assets/master_data.xlsx"
-        try:
-            # The load_and_process_data function can handle a file path directly
-            uploaded_file = default_file_path
-            st.info("Displaying dashboard from the latest master data file.")
-        except FileNotFoundError:
-            st.error(f"Critical Error: The master data file at '{default_file_path}' was not found. Please contact the administrator.")
-            st.stop() # Halt execution if the default file is missing
-        except Exception as e:
-            st.error(f"An error occurred while loading the master data file: {e}")
-            st.stop() # Halt execution on other loading errors
+        # The master file is parsed and swapped in by a background watcher; sessions only wait
+        # for the very first load after a server start.
+        watcher = _master_watcher()
+        workbook = watcher.current()
+        if workbook is None:
+            if isinstance(watcher.last_error, FileNotFoundError):
+                st.error(f"Critical Error: The master data file at '{MASTER_DATA_PATH}' was not found. Please contact the administrator.")
+            else:
+                st.error(f"An error occurred while loading the master data file: {watcher.last_error}")
+            st.stop() # Halt execution if the master data is unavailable
+        st.info("Displaying dashboard from the latest master data file.")
 
-    if not uploaded_file:
+    if workbook is None and not uploaded_file:
         st.info("Please upload an Excel file to begin.")
     else:
         try:
-            total_rows, trade_rows, col_map, df_location = load_and_process_data(uploaded_file)
-
-            if selected_view == "Combined":
-                kpi_data = total_rows[total_rows['cleaned_company_label'] == 'grand total']
-                display_trades = trade_rows
-            else:
-                kpi_data = total_rows[total_rows['cleaned_company_label'] == f'{selected_view.lower()} total']
-                display_trades = trade_rows[trade_rows[col_map["company"]] == selected_view]
-            
-            kpi_groups = {
-                "Key Financials 💰": [{"label": "Total Payments Received", "key": "total_received", "metric_format": "₹{:,.2f}", "df_format": "₹ %.2f"}, {"label": "Total Pending Amount", "key": "total_pending", "metric_format": "₹{:,.2f}", "df_format": "₹ %.2f"}],
-                "Logistics & Operations 📦": [{"label": "Total Offered", "key": "offered", "metric_format": "{:,.0f}", "df_format": "%d"}, {"label": "Deliveries Made", "key": "delivery", "metric_format": "{:,.0f}", "df_format": "%d"}, {"label": "Items Pending Delivery", "key": "pending_delivery", "metric_format": "{:,.0f}", "df_format": "%d"}],
-                "Payment Status (30% Advance)": [{"label": "Sum of 30% Payments", "key": "payment_30_amount", "metric_format": "₹{:,.2f}", "df_format": "₹ %.2f"}, {"label": "Balance 30%", "key": "balance_30", "metric_format": "₹{:,.2f}", "df_format": "₹ %.2f"}, {"label": "30% Payment Count", "key": "payment_30_count", "metric_format": "{:,.0f}", "df_format": "%d"}],
-                "Payment Status (70% Balance)": [{"label": "Sum of 70% Payments", "key": "payment_70_amount", "metric_format": "₹{:,.2f}", "df_format": "₹ %.2f"}, {"label": "Balance 70%", "key": "balance_70", "metric_format": "₹{:,.2f}", "df_format": "₹ %.2f"}, {"label": "Overall Balance Count", "key": "balance_count", "metric_format": "{:,.0f}", "df_format": "%d"}]
-            }
+            with span("get_workbook"):
+                dataset, views = workbook or _load_workbook(uploaded_file)
+            view = views[selected_view]
+            if user_role == 'admin':
+                render_diagnostics(dataset)
+            col_map, display_trades = view.col_map, view.trades
             
-            tab1, tab2, tab3 = st.tabs(["📊 Dashboard Summary", "📋 Trade-wise Details", "📍 Location-wise Payments"])
+            tab1, tab2, tab3, tab4 = st.tabs(["📊 Dashboard Summary", "📋 Trade-wise Details", "📍 Location-wise Payments", "📈 Trends"])
 
-            with tab1:
+            with tab1, span("render_summary_tab"):
                 st.markdown(f"### Overall Performance: {selected_view}")
-                if kpi_data.empty:
-                    st.error(f"Error: Could not find the summary row for '{selected_view}'.")
+                if view.kpis is None:
+                    st.error(f"Error: The workbook has no trade rows or total row for '{selected_view}'.")
                 else:
-                    kpi_row = kpi_data.iloc[0]
-                    for group_title, kpis in kpi_groups.items():
-                        st.subheader(group_title)
-                        cols = st.columns(len(kpis))
-                        for i, kpi in enumerate(kpis):
-                            with cols[i]:
-                                st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-                                value = kpi_row.get(col_map.get(kpi["key"]), 0)
-                                st.metric(label=kpi["label"], value=kpi["metric_format"].format(value))
-                                button_label = "Close" if st.session_state.active_breakdown == kpi['key'] else "View Breakdown"
-                                if st.button(button_label, key=f"btn_{kpi['key']}", use_container_width=True):
-                                    st.session_state.active_breakdown = None if st.session_state.active_breakdown == kpi['key'] else kpi['key']
-                                    st.rerun()
-                                st.markdown('</div>', unsafe_allow_html=True)
-                        active_kpi_in_group = next((k for k in kpis if k['key'] == st.session_state.active_breakdown), None)
-                        if active_kpi_in_group:
-                            with st.container():
-                                st.markdown('<div class="breakdown-container">', unsafe_allow_html=True)
-                                st.markdown(f"#### Breakdown for: **{active_kpi_in_group['label']}**")
-                                metric_col, trade_col, company_col = col_map.get(active_kpi_in_group['key']), col_map.get('trade'), col_map.get('company')
-                                cols_to_show, rename_map = [trade_col], {trade_col: "Trade"}
-                                if selected_view == "Combined":
-                                    cols_to_show.append(company_col)
-                                    rename_map[company_col] = "Company"
-                                cols_to_show.append(metric_col)
-                                rename_map[metric_col] = active_kpi_in_group['label']
-                                breakdown_df = display_trades[cols_to_show].copy().rename(columns=rename_map)
-                                col_config = { active_kpi_in_group['label']: st.column_config.NumberColumn(format=active_kpi_in_group['df_format']) }
-                                st.dataframe(breakdown_df, use_container_width=True, column_config=col_config, hide_index=True)
-                                st.markdown('</div>', unsafe_allow_html=True)
-
-            with tab2:
+                    if view.kpi_mismatches:
+                        details = "\n".join(
+                            f"- {KPI_BY_KEY[key].label}: {KPI_BY_KEY[key].metric_format.format(computed)} from the trade rows, "
+                            f"{KPI_BY_KEY[key].metric_format.format(workbook)} in the total row"
+                            for key, (computed, workbook) in view.kpi_mismatches.items()
+                        )
+                        st.warning(f"The workbook's total row for '{selected_view}' does not match its trade rows. The cards show the sums of the trade rows.\n\n{details}")
+                    for group_title, kpis in KPI_GROUPS.items():
+                        render_kpi_group(view, group_title, kpis)
+
+            with tab2, span("render_trades_tab"):
                 st.markdown(f"### Trade-wise Details: {selected_view}")
-                trade_emojis = {'potter': '🏺', 'washerman': '🧺', 'metalsmith': '⚙️', 'sculptor': '🗿', 'fishingnet': '🕸️', 'hammer': '🔨', 'armourer': '🛡️', 'boatmaker': '🚤', 'barber': '💈', 'default': '🔧'}
                 if display_trades.empty:
                     st.info("No trade data to display for the selected view.")
                 else:
-                    for _, row in display_trades.iterrows():
-                        trade_name = str(row[col_map["trade"]]).strip()
-                        if not trade_name: continue
-                        company_name = row.get(col_map["company"], "")
-                        emoji = trade_emojis.get(trade_name.lower(), trade_emojis['default'])
-                        expander_title = f"{emoji} {trade_name}"
-                        if selected_view == "Combined" and company_name:
-                            expander_title += f" ({company_name})"
-                        with st.expander(expander_title):
-                            for group_title, kpis in kpi_groups.items():
-                                st.markdown(f"**{group_title.split(' ')[0]}**")
-                                cols = st.columns(len(kpis))
-                                for i, kpi in enumerate(kpis):
-                                    with cols[i]:
-                                        value = row.get(col_map.get(kpi["key"]), 0)
-                                        st.metric(label=kpi["label"], value=kpi["metric_format"].format(value))
-                                st.divider()
-
-            with tab3:
+                    render_trade_details(view)
+
+            with tab3, span("render_locations_tab"):
                 st.markdown("### Location-wise 30% Payment Data")
-                if kpi_data.empty:
+                if view.kpis is None:
                     st.error("Cannot display KPI cards because the main summary row is missing.")
                 else:
-                    kpi_row = kpi_data.iloc[0]
                     st.subheader("Overall 30% Payment Status")
                     
-                    thirty_percent_col = col_map['thirty_percent_value']
-                    df_location['Pending Amount'] = df_location['Pending Count'] * pd.to_numeric(df_location[thirty_percent_col], errors='coerce')
-                    total_pending_amount_30 = df_location['Pending Amount'].sum()
-                    
-                    c1, c2, c3 = st.columns(3)
-                    with c1: st.metric("Total 30% Payments Received (Count)", f"{int(df_location['Received Count'].sum()):,}")
-                    with c2: st.metric("Total 30% Payments Pending (Count)", f"{int(df_location['Pending Count'].sum()):,}")
-                    with c3: st.metric("Total Pending Amount (30%)", f"₹{total_pending_amount_30:,.2f}")
+                    for col, metric in zip(st.columns(len(LOCATION_METRICS)), LOCATION_METRICS):
+                        col.metric(metric.label, metric.metric_format.format(view.location_totals[metric.key]))
 
                     st.divider()
                     st.subheader("Trade-wise Breakdown by Location")
@@ -442,24 +759,34 @@ def main_dashboard(user_info):
                         company_name = trade_row[col_map["company"]]
                         received_count_total = int(trade_row.get(col_map.get('payment_30_count'), 0))
                         offered_total = int(trade_row.get(col_map.get('offered'), 0))
-                        emoji = trade_emojis.get(trade_name.lower(), trade_emojis['default'])
+                        emoji = TRADE_EMOJIS.get(trade_name.lower(), TRADE_EMOJIS['default'])
                         expander_title = f"{emoji} {trade_name} "
                         if selected_view == "Combined": expander_title += f"({company_name}) "
                         expander_title += f"— Received: {received_count_total} / {offered_total}"
                         
                         with st.expander(expander_title):
-                            location_df_filtered = df_location[df_location['Row Labels'] == trade_name]
-                            if selected_view != "Combined":
-                                location_df_filtered = location_df_filtered[location_df_filtered['Company'] == company_name]
-                            
-                            if location_df_filtered.empty:
+                            final_df = view.location_table(trade_name)
+                            if final_df is None:
                                 st.info("No location-specific data found for this trade.")
                                 continue
                             
-                            final_df = location_df_filtered[['Location', 'Received Count', 'Pending Count', 'Pending Amount']].sort_values(by="Pending Count", ascending=False)
                             col_config = { "Pending Amount": st.column_config.NumberColumn(label="Pending Amount (₹)", format="₹ %.2f") }
                             st.dataframe(final_df, use_container_width=True, hide_index=True, column_config=col_config)
 
+            with tab4:
+                st.markdown(f"### Trends: {selected_view}")
+                history = _history()
+                if history is None:
+                    st.info("The history store is turned off (DASHBOARD_HISTORY_PATH is empty).")
+                else:
+                    if uploaded_file:
+                        source = _source_name(uploaded_file)
+                    elif user_role == 'admin':
+                        source = st.session_state.get("batch_source")
+                    else:
+                        source = _source_name(MASTER_DATA_PATH)
+                    render_trends(view, history, source, choose_source=user_role == 'admin')
+
         except Exception as e:
             st.error(f"A critical error occurred. Please check your Excel file. Error: {e}")
 
@@ -488,4 +815,6 @@ if not st.session_state['logged_in']:
             else:
                 st.error("The username or password you entered is incorrect.")
 else:
-    main_dashboard(st.session_state['user_info'])
\ No newline at end of file
+    main_dashboard(st.session_state['user_info'])
+    if instrumentation.METRICS_ENABLED:
+        export_metrics()
\ No newline at end of file
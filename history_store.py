@@ -0,0 +1,211 @@
+import datetime
+import os
+import sqlite3
+import threading
+from contextlib import closing
+
+import pandas as pd
+
+from views import KPI_KEYS, KPI_METRICS
+
+
+# Unlike the snapshot cache, the history cannot be rebuilt from the current workbook, so it
+# lives outside .dashboard_cache. An empty value turns recording off.
+HISTORY_PATH = os.environ.get("DASHBOARD_HISTORY_PATH", "dashboard_history.sqlite")
+
+LOCATION_METRICS = ["received_count", "pending_count", "pending_amount"]
+
+_KPI_COLUMNS = ", ".join(f"{key} REAL" for key in KPI_KEYS)
+
+# One row per (company, snapshot) and per (company, trade, snapshot), aggregated at ingest, so a
+# time series is an index range scan whose cost depends on the number of snapshots in it, not
+# on the size of the workbooks they came from. Snapshots are only ever appended; a workbook that
+# goes back to an earlier version (A -> B -> A) gets a new one, so the latest is what is served.
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY, source TEXT NOT NULL, fingerprint TEXT NOT NULL, taken_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_by_source ON snapshots (source, taken_at);
+CREATE TABLE IF NOT EXISTS company_kpis (
+    company TEXT NOT NULL, snapshot_id INTEGER NOT NULL, {_KPI_COLUMNS}, PRIMARY KEY (company, snapshot_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS trade_kpis (
+    company TEXT NOT NULL, trade TEXT NOT NULL, snapshot_id INTEGER NOT NULL, {_KPI_COLUMNS},
+    PRIMARY KEY (company, trade, snapshot_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS trade_kpis_by_snapshot ON trade_kpis (snapshot_id, company);
+CREATE TABLE IF NOT EXISTS location_counts (
+    company TEXT NOT NULL, location TEXT NOT NULL, snapshot_id INTEGER NOT NULL,
+    received_count REAL, pending_count REAL, pending_amount REAL, PRIMARY KEY (company, location, snapshot_id)
+) WITHOUT ROWID;
+"""
+
+
+def _add_kpi_columns(connection):
+    # A KPI added to the registry after the database was created gets a column; earlier snapshots read NULL.
+    for table in ("company_kpis", "trade_kpis"):
+        existing = {row[1] for row in connection.execute(f"PRAGMA table_info({table})")}
+        for key in KPI_KEYS:
+            if key not in existing:
+                connection.execute(f"ALTER TABLE {table} ADD COLUMN {key} REAL")
+
+
+def _number(value):
+    value = pd.to_numeric(value, errors="coerce")
+    return None if pd.isna(value) else float(value)
+
+
+class HistoryStore:
+    """Append-only store of per-company, per-trade and per-location figures, one snapshot per workbook version.
+
+    Recording never fails a load: a database error is kept in ``last_error`` and the dashboard
+    carries on without that snapshot.
+    """
+
+    def __init__(self, path=HISTORY_PATH):
+        self.path = path
+        self.last_error = None
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        with self._schema_lock:
+            if not self._schema_ready:
+                # WAL lets sessions read trends while the watcher thread records a new version.
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.executescript(_SCHEMA)
+                _add_kpi_columns(connection)
+                self._schema_ready = True
+        return connection
+
+    def record(self, source, fingerprint, dataset, views, taken_at=None):
+        """Store one processed workbook; returns False if it is the version of ``source`` recorded last."""
+        col_map = dataset.col_map
+        kpi_columns = [col_map.get(spec.source) for spec in KPI_METRICS]
+        company_rows = [
+            (name, *(_number(view.kpis[key]) for key in KPI_KEYS)) for name, view in views.items() if view.kpis is not None
+        ]
+
+        trades = dataset.trade_rows
+        trades = pd.DataFrame({
+            "company": trades[col_map["company"]].astype(str).str.strip().to_numpy(),
+            "trade": trades[col_map["trade"]].astype(str).str.strip().to_numpy(),
+            **{key: pd.to_numeric(trades[column], errors="coerce").to_numpy() if column else float("nan") for key, column in zip(KPI_KEYS, kpi_columns)},
+        })
+        # A label repeated within a company is one series.
+        trade_rows = trades.groupby(["company", "trade"], sort=False).sum(min_count=1).reset_index()
+
+        locations = views["Combined"].locations
+        location_rows = []
+        if len(locations):
+            counts = pd.DataFrame({
+                "company": locations["Company"].astype(str).to_numpy(),
+                "location": locations["Location"].astype(str).to_numpy(),
+                "received_count": locations["Received Count"].astype("float64").to_numpy(),
+                "pending_count": locations["Pending Count"].astype("float64").to_numpy(),
+                "pending_amount": locations["Pending Amount"].astype("float64").to_numpy(),
+            })
+            per_company = counts.groupby(["company", "location"], sort=False).sum().reset_index()
+            combined = counts.drop(columns="company").groupby("location", sort=False).sum().reset_index()
+            combined.insert(0, "company", "Combined")
+            location_rows = pd.concat([per_company, combined], ignore_index=True)
+
+        taken_at = taken_at or datetime.datetime.now().isoformat(sep=" ", timespec="seconds")
+        try:
+            return self._insert(source, fingerprint, taken_at, company_rows, trade_rows, location_rows)
+        except (sqlite3.Error, OSError) as exc:
+            self.last_error = exc
+            return False
+
+    def _insert(self, source, fingerprint, taken_at, company_rows, trade_rows, location_rows):
+        with closing(self._connect()) as connection, connection:
+            # Take the write lock before reading, so two loads of the same version cannot both record it.
+            connection.execute("BEGIN IMMEDIATE")
+            latest = connection.execute(
+                "SELECT fingerprint FROM snapshots WHERE source = ? ORDER BY id DESC LIMIT 1", (source,)
+            ).fetchone()
+            if latest is not None and latest[0] == fingerprint:
+                return False
+            cursor = connection.execute(
+                "INSERT INTO snapshots (source, fingerprint, taken_at) VALUES (?, ?, ?)", (source, fingerprint, taken_at)
+            )
+            snapshot_id = cursor.lastrowid
+            placeholders = ", ".join("?" * len(KPI_KEYS))
+            connection.executemany(
+                f"INSERT INTO company_kpis (company, snapshot_id, {', '.join(KPI_KEYS)}) VALUES (?, {snapshot_id}, {placeholders})",
+                company_rows,
+            )
+            connection.executemany(
+                f"INSERT INTO trade_kpis (company, trade, snapshot_id, {', '.join(KPI_KEYS)}) VALUES (?, ?, {snapshot_id}, {placeholders})",
+                trade_rows.astype(object).where(trade_rows.notna(), None).itertuples(index=False, name=None),
+            )
+            if len(location_rows):
+                connection.executemany(
+                    f"INSERT INTO location_counts (company, location, snapshot_id, {', '.join(LOCATION_METRICS)}) VALUES (?, ?, {snapshot_id}, ?, ?, ?)",
+                    location_rows.itertuples(index=False, name=None),
+                )
+        return True
+
+    def _query(self, sql, params=()):
+        with closing(self._connect()) as connection:
+            return pd.read_sql_query(sql, connection, params=params)
+
+    def sources(self):
+        return self._query("SELECT DISTINCT source FROM snapshots ORDER BY source")["source"].tolist()
+
+    def snapshots(self, source):
+        return self._query("SELECT id, taken_at FROM snapshots WHERE source = ? ORDER BY taken_at, id", (source,))
+
+    # Series are indexed by snapshot id and carry the snapshot's taken_at, which need not be unique.
+    def company_series(self, source, company, metrics=KPI_KEYS):
+        return self._query(
+            f"SELECT s.id, s.taken_at, {', '.join('k.' + m for m in metrics)} FROM snapshots s JOIN company_kpis k "
+            "ON k.snapshot_id = s.id AND k.company = ? WHERE s.source = ? ORDER BY s.taken_at, s.id",
+            (company, source),
+        ).set_index("id")
+
+    def trades(self, snapshot_id, company=None):
+        sql, params = "SELECT DISTINCT company, trade FROM trade_kpis WHERE snapshot_id = ?", [snapshot_id]
+        if company is not None:
+            sql, params = sql + " AND company = ?", params + [company]
+        return list(self._query(sql, params).itertuples(index=False, name=None))
+
+    def trade_series(self, source, company, trade, metrics=KPI_KEYS):
+        return self._query(
+            f"SELECT s.id, s.taken_at, {', '.join('t.' + m for m in metrics)} FROM snapshots s JOIN trade_kpis t "
+            "ON t.snapshot_id = s.id AND t.company = ? AND t.trade = ? WHERE s.source = ? ORDER BY s.taken_at, s.id",
+            (company, trade, source),
+        ).set_index("id")
+
+    def locations(self, snapshot_id, company):
+        return self._query(
+            "SELECT location FROM location_counts WHERE snapshot_id = ? AND company = ? ORDER BY location", (snapshot_id, company)
+        )["location"].tolist()
+
+    def location_series(self, source, company, location):
+        return self._query(
+            f"SELECT s.id, s.taken_at, {', '.join('l.' + m for m in LOCATION_METRICS)} FROM snapshots s JOIN location_counts l "
+            "ON l.snapshot_id = s.id AND l.company = ? AND l.location = ? WHERE s.source = ? ORDER BY s.taken_at, s.id",
+            (company, location, source),
+        ).set_index("id")
+
+    def trade_changes(self, current_id, previous_id, metric, company=None):
+        """Per-trade ``metric`` in two snapshots, with the change; trades missing from one side count as 0."""
+        sql = f"SELECT company, trade, snapshot_id, {metric} AS value FROM trade_kpis WHERE snapshot_id IN (?, ?)"
+        params = [current_id, previous_id]
+        if company is not None:
+            sql, params = sql + " AND company = ?", params + [company]
+        rows = self._query(sql, params)
+        table = rows.pivot_table(index=["company", "trade"], columns="snapshot_id", values="value", aggfunc="sum", fill_value=0)
+        table = table.reindex(columns=[current_id, previous_id], fill_value=0)
+        table.columns = ["current", "previous"]
+        table["change"] = table["current"] - table["previous"]
+        return table.reset_index().sort_values("change", key=abs, ascending=False, kind="stable")
+
+    def location_totals(self, snapshot_id, company):
+        totals = self._query(
+            f"SELECT {', '.join(f'SUM({m}) AS {m}' for m in LOCATION_METRICS)} FROM location_counts WHERE snapshot_id = ? AND company = ?",
+            (snapshot_id, company),
+        )
+        return {metric: totals[metric].iloc[0] or 0 for metric in LOCATION_METRICS}
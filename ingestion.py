@@ -0,0 +1,279 @@
+import contextlib
+import hashlib
+import importlib.util
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+import xml.etree.ElementTree as ET
+import zipfile
+
+import pandas as pd
+
+
+# Readers in order of preference. calamine (Rust) parses sheets roughly 10x faster than
+# openpyxl; openpyxl is always installed with the app and is used when calamine is not.
+# "streaming" is never picked by default: it trades speed for memory and is used for large
+# workbooks (see STREAMING_THRESHOLD_MB) or when requested explicitly.
+ENGINES = ("calamine", "openpyxl", "streaming")
+STREAMING_ENGINE = "streaming"
+
+_ENGINE_MODULES = {"calamine": "python_calamine", "openpyxl": "openpyxl", "streaming": "openpyxl"}
+
+MAX_UPLOAD_MB = float(os.environ.get("DASHBOARD_MAX_UPLOAD_MB", "200"))
+STREAMING_THRESHOLD_MB = float(os.environ.get("DASHBOARD_STREAMING_THRESHOLD_MB", "20"))
+
+_SPOOL_CHUNK = 1 << 20
+
+_MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_ID = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+
+# Parts shared by every sheet: cells reference the shared strings table by index, and number
+# formats (dates) live in the styles. A change to either invalidates every sheet.
+_SHARED_MEMBERS = ("xl/sharedStrings.xml", "xl/styles.xml")
+
+
+def available_engines():
+    return [name for name in ENGINES if importlib.util.find_spec(_ENGINE_MODULES[name]) is not None]
+
+
+def default_engine():
+    requested = os.environ.get("DASHBOARD_EXCEL_ENGINE")
+    engines = available_engines()
+    if requested:
+        if requested not in engines:
+            raise ValueError(f"Excel engine '{requested}' is not available. Installed engines are: {engines}")
+        return requested
+    if not engines:
+        raise ImportError("No Excel reader is installed. Install 'python-calamine' or 'openpyxl'.")
+    return engines[0]
+
+
+def open_workbook(source, engine=None):
+    """Open a workbook without parsing any sheet; only the sheet list is read up front."""
+    engine = engine or default_engine()
+    if engine == STREAMING_ENGINE:
+        return StreamingWorkbook(source)
+    return pd.ExcelFile(source, engine=engine)
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+def source_size(source):
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    size = getattr(source, "size", None)  # st.UploadedFile
+    if size is not None:
+        return size
+    if hasattr(source, "getbuffer"):
+        return source.getbuffer().nbytes
+    position = source.tell()
+    size = source.seek(0, os.SEEK_END)
+    source.seek(position)
+    return size
+
+
+def check_upload_size(source, limit_mb=MAX_UPLOAD_MB):
+    """Raise UploadTooLarge if ``source`` is over the configured limit (0 disables it); returns its size."""
+    size = source_size(source)
+    if limit_mb and size > limit_mb * 2**20:
+        name = getattr(source, "name", None) or os.path.basename(os.fspath(source))
+        raise UploadTooLarge(
+            f"'{name}' is {size / 2**20:,.1f} MB, which is over the {limit_mb:g} MB upload limit. "
+            "Split the workbook or ask the administrator to raise DASHBOARD_MAX_UPLOAD_MB."
+        )
+    return size
+
+
+def wants_streaming(source):
+    """True for .xlsx workbooks over STREAMING_THRESHOLD_MB; the streaming engine cannot read .xls."""
+    if source_size(source) <= STREAMING_THRESHOLD_MB * 2**20:
+        return False
+    position = None if isinstance(source, (str, os.PathLike)) else source.tell()
+    try:
+        return zipfile.is_zipfile(source)
+    finally:
+        if position is not None:
+            source.seek(position)
+
+
+@contextlib.contextmanager
+def spooled(source):
+    """Yield a filesystem path for ``source``.
+
+    Paths are passed through. File-like uploads are copied to a temporary file in fixed-size
+    chunks, so no second in-memory copy of the workbook is made, and deleted afterwards.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        yield os.fspath(source)
+        return
+    # openpyxl picks its reader from the file extension.
+    suffix = os.path.splitext(getattr(source, "name", "") or "")[1] or ".xlsx"
+    fd, path = tempfile.mkstemp(prefix="dashboard-upload-", suffix=suffix)
+    try:
+        position = source.tell()
+        source.seek(0)
+        with os.fdopen(fd, "wb") as fh:
+            shutil.copyfileobj(source, fh, _SPOOL_CHUNK)
+        source.seek(position)
+        yield path
+    finally:
+        os.unlink(path)
+
+
+def _header_names(row):
+    # The labels pandas gives a header row: blanks become "Unnamed: <position>" and repeated
+    # labels get ".1", ".2", ... suffixes.
+    names, seen = [], {}
+    for position, value in enumerate(row):
+        name = f"Unnamed: {position}" if value is None or value == "" else value
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        names.append(f"{name}.{count}" if count else name)
+    return names
+
+
+def _to_column(values):
+    series = pd.Series(values, dtype=object)
+    series = series.where(series.notna(), float("nan"))  # missing cells are NaN, as pandas reads them
+    numeric = pd.to_numeric(series, errors="coerce")
+    # Like pandas' parser, a column becomes numeric only if every non-empty value converts.
+    if numeric.isna().sum() == series.isna().sum():
+        return numeric
+    return series.infer_objects()
+
+
+class StreamingWorkbook:
+    """Row-by-row workbook reader with the part of the pd.ExcelFile interface the pipeline uses.
+
+    openpyxl's read-only mode streams each sheet's XML instead of building a cell tree, and
+    only the selected columns are kept, in one buffer per column, so peak memory follows the
+    size of the output rather than of the sheet. Cells are converted the way pandas' openpyxl
+    reader converts them (blank and error cells become missing, integral floats become ints),
+    so both engines produce the same frames.
+    """
+
+    def __init__(self, source):
+        import openpyxl
+        from openpyxl.cell.cell import ERROR_CODES
+
+        self._errors = frozenset(ERROR_CODES)
+        self._book = openpyxl.load_workbook(source, read_only=True, data_only=True)
+        self.sheet_names = self._book.sheetnames
+
+    def close(self):
+        self._book.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _cell(self, value):
+        if value.__class__ is float:
+            return int(value) if value.is_integer() else value
+        if value.__class__ is str and (value == "" or value in self._errors):
+            return None
+        return value
+
+    def parse(self, sheet_name, header=0, usecols=None):
+        sheet = self._book[sheet_name]
+        sheet.reset_dimensions()  # trust the cells, not a possibly stale <dimension> tag
+        rows = sheet.iter_rows(values_only=True)
+        keep = None
+        if header == 0:
+            names = _header_names([self._cell(v) if v is not None else None for v in next(rows, ())])
+            keep = [i for i, name in enumerate(names) if usecols is None or usecols(name)]
+            names = [names[i] for i in keep]
+        elif header is not None:
+            raise ValueError("The streaming reader supports header=0 or header=None.")
+
+        cell = self._cell
+        buffers = [[] for _ in keep] if keep is not None else []
+        count = last = 0  # rows read, and rows up to the last non-empty one
+        for row in rows:
+            count += 1
+            if row.count(None) != len(row):
+                last = count
+            if keep is not None:
+                width = len(row)
+                for buffer, i in zip(buffers, keep):
+                    value = row[i] if i < width else None
+                    buffer.append(None if value is None else cell(value))
+                continue
+            # Without a header the width is whatever the widest row is; narrower rows are padded.
+            while len(buffers) < len(row):
+                buffers.append([None] * (count - 1))
+            for i, buffer in enumerate(buffers):
+                value = row[i] if i < len(row) else None
+                buffer.append(None if value is None else cell(value))
+        if keep is None:
+            names = list(range(len(buffers)))
+
+        # Trailing empty rows are dropped, as pandas does.
+        columns = {}
+        for name, buffer in zip(names, buffers):
+            del buffer[last:]
+            columns[name] = _to_column(buffer)
+            buffer.clear()
+        return pd.DataFrame(columns, index=pd.RangeIndex(last))
+
+
+def find_sheet_name(pattern, sheet_list):
+    pattern_lower = pattern.lower().strip()
+    for name in sheet_list:
+        if pattern_lower in name.lower().strip():
+            return name
+    return None
+
+
+def read_sheet(xls, sheet_name, header=0, column_patterns=None):
+    """Parse a single sheet.
+
+    With ``column_patterns`` only header cells matching one of the regexes (against the lowercased
+    header, as ``find_column`` does) are materialized, so unused Summary columns never become
+    DataFrame columns. Column order is preserved, so first-match lookups resolve the same way.
+    """
+    usecols = None
+    if column_patterns:
+        compiled = [re.compile(p) for p in column_patterns]
+        usecols = lambda name: any(p.search(str(name).lower()) for p in compiled)
+    return xls.parse(sheet_name=sheet_name, header=header, usecols=usecols)
+
+
+def sheet_fingerprints(source):
+    """Fingerprint each sheet of an .xlsx from the CRCs in the zip directory, without parsing cells.
+
+    Returns {sheet name: hex digest}, or None when the source is not an xlsx package (e.g. .xls).
+    """
+    position = None if isinstance(source, (str, os.PathLike)) else source.tell()
+    try:
+        with zipfile.ZipFile(source) as archive:
+            members = {info.filename: info for info in archive.infolist()}
+            workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+            relationships = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    except (zipfile.BadZipFile, KeyError, ET.ParseError):
+        return None
+    finally:
+        if position is not None:
+            source.seek(position)
+
+    targets = {rel.get("Id"): rel.get("Target") for rel in relationships}
+    shared = [(name, members[name].CRC, members[name].file_size) for name in _SHARED_MEMBERS if name in members]
+
+    fingerprints = {}
+    for sheet in workbook.iter(f"{_MAIN_NS}sheet"):
+        target = targets.get(sheet.get(_REL_ID))
+        if target is None:
+            return None
+        member = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+        info = members.get(member)
+        if info is None:
+            return None
+        signature = repr((sheet.get("name"), member, info.CRC, info.file_size, shared))
+        fingerprints[sheet.get("name")] = hashlib.blake2b(signature.encode(), digest_size=16).hexdigest()
+    return fingerprints or None
@@ -0,0 +1,156 @@
+import contextlib
+import functools
+import os
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass
+
+
+# "1" records wall time per stage; "memory" also traces allocations with tracemalloc, which
+# slows Python code down noticeably, so it is meant for investigating rather than left on.
+METRICS_MODE = os.environ.get("DASHBOARD_METRICS", "").strip().lower()
+METRICS_ENABLED = METRICS_MODE not in ("", "0", "false", "off")
+TRACE_MEMORY = METRICS_MODE == "memory"
+METRICS_FILE = os.environ.get("DASHBOARD_METRICS_FILE", os.path.join(".dashboard_cache", "metrics.prom"))
+
+_DISABLED = contextlib.nullcontext()
+
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    total_seconds: float = 0.0
+    last_seconds: float = 0.0
+    max_seconds: float = 0.0
+    peak_bytes: int = 0  # largest allocation peak seen within one call; 0 unless memory is traced
+
+
+class _Frame:
+    __slots__ = ("start", "high")
+
+    def __init__(self, start):
+        self.start = self.high = start
+
+
+class Metrics:
+    """Process-wide stage timings and counters, shared by every session and the watcher thread.
+
+    Allocation peaks come from tracemalloc, which tracks the whole process: a span's peak
+    includes whatever other threads allocated while it ran.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stages = {}
+        self.counters = {}
+
+    @contextlib.contextmanager
+    def _span(self, name):
+        frames = None
+        if TRACE_MEMORY:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            frames = self._local.__dict__.setdefault("frames", [])
+            current, peak = tracemalloc.get_traced_memory()
+            if frames:
+                # reset_peak() below would lose the enclosing span's high-water mark.
+                frames[-1].high = max(frames[-1].high, peak)
+            tracemalloc.reset_peak()
+            frames.append(_Frame(current))
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            peak_bytes = 0
+            if frames:
+                frame = frames.pop()
+                frame.high = max(frame.high, tracemalloc.get_traced_memory()[1])
+                peak_bytes = frame.high - frame.start
+                if frames:
+                    frames[-1].high = max(frames[-1].high, frame.high)
+            with self._lock:
+                stats = self.stages.setdefault(name, StageStats())
+                stats.calls += 1
+                stats.total_seconds += elapsed
+                stats.last_seconds = elapsed
+                stats.max_seconds = max(stats.max_seconds, elapsed)
+                stats.peak_bytes = max(stats.peak_bytes, peak_bytes)
+
+    def span(self, name):
+        """Context manager recording the time (and, when traced, allocation peak) of one stage."""
+        if not METRICS_ENABLED:
+            return _DISABLED
+        return self._span(name)
+
+    def count(self, name, amount=1):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            stages = {name: StageStats(**vars(stats)) for name, stats in self.stages.items()}
+            return stages, dict(self.counters)
+
+    def to_prometheus(self, counters=None, gauges=None):
+        """Render everything in the Prometheus text exposition format.
+
+        ``counters`` and ``gauges`` add values kept elsewhere, e.g. the dataset cache's statistics.
+        """
+        stages, own_counters = self.snapshot()
+        counters = dict(own_counters, **(counters or {}))
+        series = [
+            ("dashboard_stage_calls_total", "counter", "Times the stage ran.", lambda s: s.calls),
+            ("dashboard_stage_seconds_total", "counter", "Wall time spent in the stage.", lambda s: s.total_seconds),
+            ("dashboard_stage_last_seconds", "gauge", "Wall time of the stage's latest run.", lambda s: s.last_seconds),
+            ("dashboard_stage_max_seconds", "gauge", "Slowest run of the stage.", lambda s: s.max_seconds),
+        ]
+        if TRACE_MEMORY:
+            series.append(("dashboard_stage_peak_bytes", "gauge", "Largest allocation peak within one run of the stage.", lambda s: s.peak_bytes))
+        lines = []
+        for metric, kind, help_text, value in series:
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+            lines += [f'{metric}{{stage="{_escape(name)}"}} {value(stats)}' for name, stats in sorted(stages.items())]
+        for name, value in sorted(counters.items()):
+            lines += [f"# TYPE dashboard_{name}_total counter", f"dashboard_{name}_total {value}"]
+        for name, value in sorted((gauges or {}).items()):
+            lines += [f"# TYPE dashboard_{name} gauge", f"dashboard_{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def export(self, path=None, counters=None, gauges=None):
+        """Write the metrics file (e.g. for node_exporter's textfile collector); readers never see a partial file."""
+        if not METRICS_ENABLED:
+            return
+        path = path or METRICS_FILE
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        staging = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(staging, "w", encoding="utf-8") as fh:
+            fh.write(self.to_prometheus(counters, gauges))
+        os.replace(staging, path)
+
+
+def timed(name):
+    """Decorator form of ``span``; the function is returned untouched when metrics are off."""
+    def decorate(func):
+        if not METRICS_ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with metrics.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _escape(label):
+    return label.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics = Metrics()
+span = metrics.span
+count = metrics.count
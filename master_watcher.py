@@ -0,0 +1,84 @@
+import os
+import threading
+import time
+
+
+WATCH_INTERVAL_SECONDS = float(os.environ.get("DASHBOARD_WATCH_INTERVAL_SECONDS", "5"))
+
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class MasterDataWatcher:
+    """Polls the master workbook and hot-swaps the processed dataset off the request path.
+
+    ``load(path)`` must parse and validate the workbook (load_dataset raises ValueError when a
+    sheet or a location table is missing). A new version only replaces the current one after it
+    loads cleanly; a bad upload is recorded in ``last_error`` and the previous dataset stays live.
+    A changed file is parsed once its size and mtime have been stable for one poll interval, so a
+    copy that is still being written is not picked up half way.
+    """
+
+    def __init__(self, path, load, interval=WATCH_INTERVAL_SECONDS):
+        self.path = path
+        self.interval = interval
+        self._load = load
+        self._current = None  # (signature, value), replaced as a whole
+        self._pending = None
+        self._failed = None
+        self._first_attempt = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_error = None
+        self.loaded_at = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="master-data-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def current(self, wait=True):
+        """Return the live value. Only blocks until the very first load attempt has finished."""
+        if wait:
+            self._first_attempt.wait()
+        current = self._current
+        return current[1] if current else None
+
+    def _run(self):
+        while True:
+            self.poll()
+            if self._stop.wait(self.interval):
+                return
+
+    def poll(self):
+        signature = _file_signature(self.path)
+        current = self._current
+        if signature is None:
+            if current is None:
+                self.last_error = FileNotFoundError(f"'{self.path}' was not found.")
+            self._first_attempt.set()
+            return
+        if (current and signature == current[0]) or signature == self._failed:
+            return
+        if current is not None and signature != self._pending:
+            self._pending = signature
+            return
+
+        try:
+            value = self._load(self.path)
+        except Exception as exc:
+            self._failed, self.last_error = signature, exc
+        else:
+            self._current, self.last_error, self.loaded_at = (signature, value), None, time.time()
+        finally:
+            self._pending = None
+            self._first_attempt.set()
@@ -0,0 +1,46 @@
+"""Process workbooks ahead of time into a dataset bundle the dashboard starts from.
+
+    python precompile.py bundle/ assets/master_data.xlsx [more.xlsx ...] [--engine calamine]
+    python precompile.py bundle/ --check
+
+Run it from a cron job or CI after the master workbook changes and start the app with
+DASHBOARD_BUNDLE=bundle/: any workbook whose contents match a bundled one (the master file
+or an admin upload) is served from the bundle without touching Excel. --check validates an
+existing bundle and exits non-zero if it cannot be served as is.
+"""
+import argparse
+import sys
+
+import bundle
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("bundle", help="bundle directory to write (or to validate with --check)")
+    parser.add_argument("workbooks", nargs="*", help="Excel workbooks to process")
+    parser.add_argument("--engine", default=None, help="Excel engine (default: calamine when installed)")
+    parser.add_argument("--check", action="store_true", help="validate the bundle instead of writing it")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        problems = bundle.check_bundle(args.bundle)
+        for problem in problems:
+            print(f"error: {problem}", file=sys.stderr)
+        if not problems:
+            print(f"{args.bundle} is valid.")
+        return 1 if problems else 0
+
+    if not args.workbooks:
+        parser.error("give at least one workbook to process")
+    try:
+        manifest = bundle.compile_bundle(args.bundle, args.workbooks, engine=args.engine)
+    except (bundle.BundleError, OSError) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    for entry in manifest["workbooks"]:
+        print(f"{entry['source']}: {entry['trades']} trade rows -> {entry['name']}/")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
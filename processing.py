@@ -0,0 +1,276 @@
+import contextlib
+import functools
+import re
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+import ingestion
+import snapshot_cache
+from instrumentation import count, span
+
+
+@functools.lru_cache(maxsize=128)
+def _match_headers(schema, headers):
+    # Memoized on the header signature: a workbook layout is resolved once, and every later
+    # upload with the same headers is a dictionary hit.
+    compiled = [(key, re.compile(pattern)) for key, pattern in schema]
+    positions = {}
+    for index, header in enumerate(headers):
+        for key, regex in compiled:
+            if key not in positions and regex.search(header):
+                positions[key] = index
+        if len(positions) == len(compiled):
+            break
+    return positions
+
+
+def resolve_columns(schema, df_columns):
+    """Map each key of ``schema`` ({key: regex}) to the first column whose lowercased header matches."""
+    columns = list(df_columns)
+    positions = _match_headers(tuple(schema.items()), tuple(str(col).lower() for col in columns))
+    return {key: columns[positions[key]] if key in positions else None for key in schema}
+
+
+def find_column(pattern, df_columns):
+    return resolve_columns({"column": pattern}, df_columns)["column"]
+
+
+def clean_labels(labels):
+    """NFKC-normalize, collapse whitespace, lowercase and strip; missing values become ''.
+
+    Label columns hold a handful of distinct values repeated over many rows, so the string
+    work runs once per unique value and is mapped back through the factorized codes.
+    """
+    codes, uniques = pd.factorize(labels, use_na_sentinel=True)
+    if len(uniques) == 0:
+        return pd.Series('', index=labels.index, dtype=object)
+    cleaned = pd.Index(uniques, dtype=object).astype(str)
+    cleaned = cleaned.str.normalize('NFKC').str.replace(r'\s+', ' ', regex=True).str.lower().str.strip()
+    values = cleaned.to_numpy(dtype=object).take(codes)
+    values[codes < 0] = ''
+    return pd.Series(values, index=labels.index, dtype=object)
+
+
+LOCATION_LABEL_COLUMNS = ['Company', 'Row Labels', 'Location']
+
+
+class Dataset(NamedTuple):
+    total_rows: pd.DataFrame
+    trade_rows: pd.DataFrame
+    col_map: dict
+    location_final: pd.DataFrame
+    memory: dict  # frame name -> {"before": bytes, "after": bytes}, from compact_dtypes
+
+
+SUMMARY_COLUMNS = {
+    "company": r'company', "trade": r'row labels',
+    "offered": r'offered', "total_received": r'received according to portal total',
+    "total_pending": r'pending according to portal total', "payment_30_count": r'count of 30% payment done',
+    "balance_count": r'balance count as per vendor', "payment_30_amount": r'sum of 30% payment received',
+    "balance_30": r'balance 30 %', "delivery": r'no. of delivery as per portal',
+    "pending_delivery": r'difference between paid and delivery updated', "payment_70_amount": r'sum of 70% payment received',
+    "balance_70": r'balance 70%',
+}
+
+
+def process_summary(df_summary):
+    col_map = resolve_columns(SUMMARY_COLUMNS, df_summary.columns)
+
+    df = df_summary.copy()
+    df['cleaned_company_label'] = clean_labels(df[col_map["company"]])
+    
+    numeric_cols = list(col_map.keys())[2:]
+    for key in numeric_cols:
+        if col_map[key] and col_map[key] in df.columns:
+            df[col_map[key]] = pd.to_numeric(df[col_map[key]], errors='coerce')
+    df.fillna(0, inplace=True)
+    
+    is_total = df['cleaned_company_label'].str.contains('total', regex=False)
+    total_rows = df[is_total]
+    trade_rows = df[~is_total]
+    return total_rows, trade_rows, col_map
+
+
+def process_location(df_location_raw):
+    split_index = df_location_raw[df_location_raw.iloc[:, 0] == 'Company'].index
+    if len(split_index) < 2: raise ValueError("Could not find two separate tables in 'Location Wise' sheet.")
+    
+    received_df_raw = df_location_raw.iloc[:split_index[1]].dropna(how='all')
+    pending_df_raw = df_location_raw.iloc[split_index[1]:].dropna(how='all')
+    
+    def process_location_table(df_raw, value_name):
+        df_raw.columns = df_raw.iloc[0]
+        df_raw = df_raw[1:].dropna(subset=[df_raw.columns[0]])
+        
+        thirty_percent_val_col = find_column(r'thirty', df_raw.columns)
+        if not thirty_percent_val_col:
+            raise ValueError(f"Required column 'Thirty' not found in the 'Location Wise' sheet.")
+
+        id_vars = [df_raw.columns[0], df_raw.columns[1], thirty_percent_val_col]
+        location_vars = [col for col in df_raw.columns if col not in id_vars]
+        
+        df_tidy = df_raw.melt(id_vars=id_vars, value_vars=location_vars, var_name="Location", value_name=value_name)
+        df_tidy[value_name] = pd.to_numeric(df_tidy[value_name], errors='coerce').fillna(0)
+        df_tidy = df_tidy[df_tidy[value_name] > 0]
+        return df_tidy, thirty_percent_val_col
+
+    received_tidy, _ = process_location_table(received_df_raw, "Received Count")
+    pending_tidy, thirty_percent_col_name = process_location_table(pending_df_raw, "Pending Count")
+
+    location_final = pd.merge(received_tidy, pending_tidy, on=['Company', 'Row Labels', 'Location', thirty_percent_col_name], how='outer').fillna(0)
+    return location_final, thirty_percent_col_name
+
+
+def _narrow_numeric(series):
+    values = series.to_numpy()
+    if series.dtype.kind == 'f' and np.isfinite(values).all() and (values == np.floor(values)).all():
+        series = series.astype('int64')
+    if series.dtype.kind == 'i':
+        # Signed only: unsigned types wrap around silently on subtraction.
+        return pd.to_numeric(series, downcast='integer')
+    if series.dtype == 'float64':
+        narrow = series.astype('float32')
+        if (narrow.astype('float64') == series).all():
+            return narrow
+    return series
+
+
+def compact_dtypes(df, label_columns):
+    """Return a copy with categorical labels and the narrowest lossless numeric types.
+
+    Label columns are converted only when every value is a string, so snapshots stay
+    representable in Arrow, and only when values repeat enough for a category to be smaller. Returns (frame, {"before": bytes, "after": bytes}).
+    """
+    before = int(df.memory_usage(deep=True).sum())
+    df = df.copy()
+    for position, (column, series) in enumerate(df.items()):
+        # Categories only pay off when labels repeat.
+        if column in label_columns and pd.api.types.infer_dtype(series, skipna=False) == 'string' and series.nunique() * 2 <= len(series):
+            df.isetitem(position, series.astype('category'))
+        elif series.dtype.kind in 'if':
+            df.isetitem(position, _narrow_numeric(series))
+    return df, {"before": before, "after": int(df.memory_usage(deep=True).sum())}
+
+
+def _compact_summary(total_rows, trade_rows, col_map):
+    labels = [col_map["company"], col_map["trade"], 'cleaned_company_label']
+    total_rows, total_memory = compact_dtypes(total_rows, labels)
+    trade_rows, trade_memory = compact_dtypes(trade_rows, labels)
+    return total_rows, trade_rows, {"total_rows": total_memory, "trade_rows": trade_memory}
+
+
+def _resolve_sheets(all_sheet_names):
+    summary_sheet = ingestion.find_sheet_name("Summary", all_sheet_names)
+    location_sheet = ingestion.find_sheet_name("Location Wise", all_sheet_names)
+
+    if not summary_sheet: raise ValueError(f"Could not find the 'Summary' sheet. Available sheets are: {all_sheet_names}")
+    if not location_sheet: raise ValueError(f"Could not find the 'Location Wise' sheet. Available sheets are: {all_sheet_names}")
+    return summary_sheet, location_sheet
+
+
+def _read_summary(xls, sheet_name):
+    # Only the Summary columns the dashboard reads are materialized.
+    return ingestion.read_sheet(xls, sheet_name, header=0, column_patterns=SUMMARY_COLUMNS.values())
+
+
+def _open_workbook(source, engine, cleanup):
+    """Open ``source`` for parsing; the workbook (and any spooled copy) is released by ``cleanup``.
+
+    Without an explicit ``engine``, .xlsx workbooks over STREAMING_THRESHOLD_MB are read with
+    the streaming engine, which needs a file on disk, so uploads are spooled to one first.
+    """
+    if engine is None and ingestion.wants_streaming(source):
+        count("streamed_workbooks")
+        with span("spool_upload"):
+            source = cleanup.enter_context(ingestion.spooled(source))
+        engine = ingestion.STREAMING_ENGINE
+    with span("open_workbook"):
+        xls = ingestion.open_workbook(source, engine=engine)
+    cleanup.callback(xls.close)
+    return xls
+
+
+def process_workbook(uploaded_file, engine=None):
+    """Parse and process a workbook from scratch, bypassing every cache."""
+    with contextlib.ExitStack() as cleanup:
+        xls = _open_workbook(uploaded_file, engine, cleanup)
+        summary_sheet, location_sheet = _resolve_sheets(xls.sheet_names)
+        total_rows, trade_rows, col_map = process_summary(_read_summary(xls, summary_sheet))
+        df_location_raw = ingestion.read_sheet(xls, location_sheet, header=None)
+
+    total_rows, trade_rows, memory = _compact_summary(total_rows, trade_rows, col_map)
+    location_final, thirty_percent_col_name = process_location(df_location_raw)
+    location_final, memory["location_final"] = compact_dtypes(location_final, LOCATION_LABEL_COLUMNS)
+    
+    col_map['thirty_percent_value'] = thirty_percent_col_name
+
+    return Dataset(total_rows, trade_rows, col_map, location_final, memory)
+
+
+def load_dataset(uploaded_file, engine=None):
+    """Like process_workbook, but re-parses only the sheets whose contents changed.
+
+    The Summary outputs and the melted location table are snapshotted independently, keyed on
+    the fingerprint of the sheet they come from, so re-uploading a workbook where only one
+    sheet was edited parses just that sheet.
+    """
+    with contextlib.ExitStack() as cleanup:
+        return _load_dataset(uploaded_file, engine, cleanup)
+
+
+def _load_dataset(uploaded_file, engine, cleanup):
+    with span("sheet_fingerprints"):
+        fingerprints = ingestion.sheet_fingerprints(uploaded_file)
+    xls = None
+    if fingerprints is None:
+        # Not an xlsx zip (e.g. legacy .xls): fall back to a whole-file key for both parts.
+        xls = _open_workbook(uploaded_file, engine, cleanup)
+        all_sheet_names = xls.sheet_names
+        workbook_key = snapshot_cache.workbook_fingerprint(uploaded_file)
+        fingerprints = {name: workbook_key for name in all_sheet_names}
+    summary_sheet, location_sheet = _resolve_sheets(list(fingerprints))
+    summary_key = f"summary-{fingerprints[summary_sheet]}"
+    location_key = f"location-{fingerprints[location_sheet]}"
+
+    with span("snapshot_load"):
+        summary = snapshot_cache.load_snapshot(summary_key)
+        location = snapshot_cache.load_snapshot(location_key)
+    for snapshot in (summary, location):
+        count("snapshot_misses" if snapshot is None else "snapshot_hits")
+    if (summary is None or location is None) and xls is None:
+        xls = _open_workbook(uploaded_file, engine, cleanup)
+
+    if summary is None:
+        with span("read_summary"):
+            df_summary = _read_summary(xls, summary_sheet)
+        with span("clean_summary"):
+            total_rows, trade_rows, col_map = process_summary(df_summary)
+        with span("compact_dtypes"):
+            total_rows, trade_rows, summary_memory = _compact_summary(total_rows, trade_rows, col_map)
+        with span("snapshot_save"):
+            snapshot_cache.save_snapshot(
+                summary_key, {"total_rows": total_rows, "trade_rows": trade_rows}, {"col_map": col_map, "memory": summary_memory}
+            )
+    else:
+        frames, meta = summary
+        total_rows, trade_rows, col_map, summary_memory = frames["total_rows"], frames["trade_rows"], meta["col_map"], meta["memory"]
+
+    if location is None:
+        with span("read_location"):
+            df_location_raw = ingestion.read_sheet(xls, location_sheet, header=None)
+        with span("melt_merge_location"):
+            location_final, thirty_percent_col_name = process_location(df_location_raw)
+        with span("compact_dtypes"):
+            location_final, location_memory = compact_dtypes(location_final, LOCATION_LABEL_COLUMNS)
+        with span("snapshot_save"):
+            snapshot_cache.save_snapshot(
+                location_key, {"location_final": location_final}, {"thirty_percent_value": thirty_percent_col_name, "memory": location_memory}
+            )
+    else:
+        frames, meta = location
+        location_final, thirty_percent_col_name, location_memory = frames["location_final"], meta["thirty_percent_value"], meta["memory"]
+
+    col_map = dict(col_map, thirty_percent_value=thirty_percent_col_name)
+    return Dataset(total_rows, trade_rows, col_map, location_final, dict(summary_memory, location_final=location_memory))
@@ -0,0 +1,170 @@
+import datetime
+import hashlib
+import json
+import numbers
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+
+CACHE_DIR = os.environ.get("DASHBOARD_CACHE_DIR", ".dashboard_cache")
+
+# Bump whenever the processing pipeline changes shape, so old snapshots are ignored.
+SNAPSHOT_VERSION = 5
+
+_HASH_CHUNK = 1 << 20
+_path_digests = {}
+
+
+def _hash_stream(stream):
+    digest = hashlib.blake2b(digest_size=16)
+    for chunk in iter(lambda: stream.read(_HASH_CHUNK), b""):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def workbook_fingerprint(source):
+    """Content hash of a workbook given as a path or a file-like object (e.g. st.UploadedFile)."""
+    if isinstance(source, (str, os.PathLike)):
+        # Re-hashing an unchanged file on every rerun is wasted work, so memoize on (size, mtime).
+        stat = os.stat(source)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        cached = _path_digests.get(os.fspath(source))
+        if cached and cached[0] == signature:
+            return cached[1]
+        with open(source, "rb") as fh:
+            digest = _hash_stream(fh)
+        _path_digests[os.fspath(source)] = (signature, digest)
+        return digest
+
+    if hasattr(source, "getbuffer"):
+        return hashlib.blake2b(source.getbuffer(), digest_size=16).hexdigest()
+
+    position = source.tell()
+    source.seek(0)
+    digest = _hash_stream(source)
+    source.seek(position)
+    return digest
+
+
+def _snapshot_dir(key):
+    return os.path.join(CACHE_DIR, f"v{SNAPSHOT_VERSION}", key)
+
+
+def _is_plain_object_column(series):
+    values = series.dropna()
+    return values.empty or values.map(type).eq(str).all()
+
+
+def _encode_cell(value):
+    # (type tag, text) for one cell of a mixed column; bool is checked before int, its base class.
+    if value is None:
+        return "n", ""
+    if value is pd.NaT:
+        return "t", ""
+    if isinstance(value, bool):
+        return "b", str(value)
+    if isinstance(value, numbers.Integral):
+        return "i", str(int(value))
+    if isinstance(value, numbers.Real):
+        return "f", repr(float(value))
+    if isinstance(value, str):
+        return "s", value
+    if isinstance(value, datetime.datetime):
+        return "d", value.isoformat()
+    raise TypeError(f"Cannot store a {type(value).__name__} value in a snapshot.")
+
+
+_DECODERS = {
+    "n": lambda text: None,
+    "t": lambda text: pd.NaT,
+    "b": lambda text: text == "True",
+    "i": int,
+    "f": float,
+    "s": str,
+    "d": datetime.datetime.fromisoformat,
+}
+
+
+def _frame_to_table(df):
+    # Arrow needs string field names and a single type per column. Headers are restored from
+    # the manifest, and mixed-type label columns (e.g. "Row Labels" on total rows, where the
+    # blank cells were filled with 0) are stored as text plus a per-cell type tag, so they
+    # round-trip exactly without ever deserializing code from a snapshot or bundle.
+    columns, tagged = {}, []
+    for position, (_, series) in enumerate(df.items()):
+        name = f"c{position}"
+        if series.dtype == object and not _is_plain_object_column(series):
+            tags, texts = zip(*map(_encode_cell, series)) if len(series) else ((), ())
+            columns[f"t{position}"] = pd.Series(tags, index=df.index, dtype=object)
+            series = pd.Series(texts, index=df.index, dtype=object)
+            tagged.append(position)
+        columns[name] = series
+    table = pa.Table.from_pandas(pd.DataFrame(columns, index=df.index), preserve_index=True)
+    return table, tagged
+
+
+def _table_to_frame(table, columns, tagged):
+    df = table.to_pandas()
+    for position in tagged:
+        cells = [_DECODERS[tag](text) for tag, text in zip(df.pop(f"t{position}"), df[f"c{position}"])]
+        df[f"c{position}"] = pd.Series(cells, index=df.index, dtype=object)
+    df.columns = columns
+    return df
+
+
+def read_frames(directory):
+    """Return (frames, meta) stored by write_frames, or None when the directory holds no usable data."""
+    manifest_path = os.path.join(directory, "manifest.json")
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path, encoding="utf-8") as fh:
+            manifest = json.load(fh)
+        frames = {}
+        for name, spec in manifest["frames"].items():
+            table = feather.read_table(os.path.join(directory, f"{name}.arrow"), memory_map=True)
+            frames[name] = _table_to_frame(table, spec["columns"], spec["tagged"])
+        return frames, manifest["meta"]
+    except (OSError, ValueError, KeyError, TypeError, pa.ArrowException):
+        # A truncated or foreign snapshot is just a cache miss.
+        return None
+
+
+def write_frames(directory, frames, meta):
+    """Persist DataFrames as uncompressed Arrow IPC files (memory-mappable) plus a JSON manifest.
+
+    Returns False if the data could not be represented; callers keep working from memory.
+    """
+    os.makedirs(os.path.dirname(directory), exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f".{os.path.basename(directory)}-", dir=os.path.dirname(directory))
+    try:
+        manifest = {"meta": meta, "frames": {}}
+        for name, df in frames.items():
+            table, tagged = _frame_to_table(df)
+            feather.write_feather(table, os.path.join(staging, f"{name}.arrow"), compression="uncompressed")
+            manifest["frames"][name] = {"columns": list(df.columns), "tagged": tagged}
+        with open(os.path.join(staging, "manifest.json"), "w", encoding="utf-8") as fh:
+            json.dump(manifest, fh)
+        # Rename is atomic, so concurrent readers never see a half-written snapshot.
+        os.rename(staging, directory)
+        return True
+    except (OSError, TypeError, ValueError, pa.ArrowException):
+        shutil.rmtree(staging, ignore_errors=True)
+        return os.path.exists(directory)
+
+
+def load_snapshot(key):
+    """Return (frames, meta) for a stored snapshot, or None when there is no usable snapshot."""
+    return read_frames(_snapshot_dir(key))
+
+
+def save_snapshot(key, frames, meta):
+    directory = _snapshot_dir(key)
+    if os.path.exists(directory):
+        return True
+    return write_frames(directory, frames, meta)
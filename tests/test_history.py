@@ -0,0 +1,48 @@
+"""History recording through the dataset cache, as the master watcher and uploads load workbooks."""
+import shutil
+
+import pytest
+
+import excel_to_dashboard as app
+import snapshot_cache
+from dataset_cache import DatasetCache
+from history_store import HistoryStore
+from synthetic_workbook import generate_workbook
+
+
+@pytest.fixture(autouse=True)
+def _snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot_cache, "CACHE_DIR", str(tmp_path / "cache"))
+
+
+def _versions(tmp_path):
+    version_a, version_b = tmp_path / "a.xlsx", tmp_path / "b.xlsx"
+    generate_workbook(version_a, trades=20, locations=3)
+    generate_workbook(version_b, trades=30, locations=3)
+    return version_a, version_b
+
+
+def test_returning_to_a_cached_version_is_recorded(tmp_path):
+    version_a, version_b = _versions(tmp_path)
+    master = tmp_path / "master_data.xlsx"
+    cache, history = DatasetCache(1 << 30), HistoryStore(str(tmp_path / "history.sqlite"))
+
+    for version in (version_a, version_b, version_a):
+        shutil.copyfile(version, master)
+        app._load_into(cache, str(master), {}, history)
+
+    # The second load of version A is a cache hit and must still become the latest snapshot.
+    assert cache.stats()["hits"] == 1
+    assert len(history.snapshots("master_data.xlsx")) == 3
+
+
+def test_session_reruns_record_a_version_once(tmp_path):
+    version_a, version_b = _versions(tmp_path)
+    cache, history = DatasetCache(1 << 30), HistoryStore(str(tmp_path / "history.sqlite"))
+    recorded = {}
+
+    for version in (version_a, version_a, version_b, version_b, version_a):
+        shutil.copyfile(version, tmp_path / "upload.xlsx")
+        app._load_into(cache, str(tmp_path / "upload.xlsx"), {}, history, recorded)
+
+    assert len(history.snapshots("upload.xlsx")) == 3
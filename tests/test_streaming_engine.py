@@ -0,0 +1,80 @@
+"""The streaming engine must produce exactly the frames pandas' openpyxl reader produces."""
+import io
+
+import openpyxl
+import pandas as pd
+import pytest
+
+import ingestion
+import processing
+import snapshot_cache
+from synthetic_workbook import generate_workbook
+
+
+@pytest.fixture(scope="module")
+def workbook(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("streaming") / "workbook.xlsx")
+    generate_workbook(path, trades=60, locations=12, junk_sheets=1, junk_rows=50, unused_columns=3, seed=7)
+    book = openpyxl.load_workbook(path)
+    sheet = book.create_sheet("Edge Cases")
+    # Blank and duplicate headers, error cells, blanks, integral floats, mixed and numeric-text
+    # columns, a row that is empty in every column, and trailing empty rows.
+    sheet.append(["Name", None, "Name", "Amount", "Amount", "Mixed", "Text Numbers"])
+    sheet.append(["a", 1, "x", 10.0, 1.5, "one", "12"])
+    sheet.append([None, None, None, "#N/A", None, 2, "7"])
+    sheet.append([])
+    sheet.append(["b", 2.0, "#DIV/0!", 3, None, None, None])
+    sheet.append(["", None, "y", None, 2.25, 3.5, "40"])
+    sheet.append([])
+    sheet.append([])
+    book.save(path)
+    return path
+
+
+@pytest.mark.parametrize("header", [0, None])
+def test_every_sheet_matches_openpyxl(workbook, header):
+    expected = pd.ExcelFile(workbook, engine="openpyxl")
+    streamed = ingestion.open_workbook(workbook, engine=ingestion.STREAMING_ENGINE)
+    assert streamed.sheet_names == expected.sheet_names
+    for sheet in expected.sheet_names:
+        pd.testing.assert_frame_equal(streamed.parse(sheet, header=header), expected.parse(sheet, header=header), obj=sheet)
+    streamed.close()
+
+
+def test_column_selection_matches_openpyxl(workbook):
+    keep = lambda name: str(name).startswith(("Company", "Offered", "Balance"))
+    expected = pd.read_excel(workbook, sheet_name="Summary", engine="openpyxl", usecols=keep)
+    with ingestion.open_workbook(workbook, engine=ingestion.STREAMING_ENGINE) as streamed:
+        pd.testing.assert_frame_equal(streamed.parse("Summary", usecols=keep), expected)
+
+
+def test_processed_dataset_matches_openpyxl(workbook):
+    expected = processing.process_workbook(workbook, engine="openpyxl")
+    streamed = processing.process_workbook(workbook, engine=ingestion.STREAMING_ENGINE)
+    assert streamed.col_map == expected.col_map
+    for frame in ("total_rows", "trade_rows", "location_final"):
+        pd.testing.assert_frame_equal(getattr(streamed, frame), getattr(expected, frame), obj=frame)
+
+
+def test_large_uploads_are_spooled_and_streamed(workbook, tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot_cache, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(ingestion, "STREAMING_THRESHOLD_MB", 0)
+    opened = []
+    real_open = ingestion.open_workbook
+    monkeypatch.setattr(ingestion, "open_workbook", lambda source, engine=None: opened.append((source, engine)) or real_open(source, engine))
+
+    with open(workbook, "rb") as fh:
+        upload = io.BytesIO(fh.read())
+    upload.name = "upload.xlsx"
+    dataset = processing.load_dataset(upload)
+
+    [(source, engine)] = opened
+    assert engine == ingestion.STREAMING_ENGINE and isinstance(source, str)
+    expected = processing.process_workbook(workbook, engine="openpyxl")
+    pd.testing.assert_frame_equal(dataset.trade_rows, expected.trade_rows)
+
+
+def test_upload_size_limit(workbook):
+    with pytest.raises(ingestion.UploadTooLarge, match="DASHBOARD_MAX_UPLOAD_MB"):
+        ingestion.check_upload_size(workbook, limit_mb=0.001)
+    assert ingestion.check_upload_size(workbook, limit_mb=0) > 0
@@ -0,0 +1,67 @@
+"""KPIs computed from trade rows that compact_dtypes stored in narrow types."""
+import numpy as np
+import pytest
+from openpyxl import Workbook
+
+import processing
+from synthetic_workbook import SUMMARY_HEADERS
+from views import build_company_views
+
+TRADES_PER_COMPANY = 500
+OFFERED = 30_000  # fits int16; a company's total does not
+BALANCE_30 = 1_500_000_000  # fits int32; the totals do not
+RECEIVED = 1_234_567.5  # exact in float32; the totals are not
+
+
+def _write_workbook(path, grand_total_offset=0):
+    book = Workbook(write_only=True)
+    summary = book.create_sheet("Summary")
+    summary.append(SUMMARY_HEADERS)
+    row = {"Offered": OFFERED, "Balance 30 %": BALANCE_30, "Received according to portal Total": RECEIVED}
+    values = [row.get(header, 1) for header in SUMMARY_HEADERS[2:]]
+    for company in ("PTPL", "VTL"):
+        for trade in range(TRADES_PER_COMPANY):
+            summary.append([company, f"Trade {trade}"] + values)
+        summary.append([f"{company} Total", None] + [value * TRADES_PER_COMPANY for value in values])
+    grand_total = [value * TRADES_PER_COMPANY * 2 for value in values]
+    grand_total[0] += grand_total_offset
+    summary.append(["Grand Total", None] + grand_total)
+
+    location = book.create_sheet("Location Wise")
+    header = ["Company", "Row Labels", "Thirty Percent Value", "District 1"]
+    location.append(header)
+    location.append(["PTPL", "Trade 0", 4500, 1])
+    location.append([])
+    location.append(header)
+    location.append(["PTPL", "Trade 0", 4500, 2])
+    book.save(path)
+    return str(path)
+
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory):
+    return processing.process_workbook(_write_workbook(tmp_path_factory.mktemp("views") / "wide.xlsx"))
+
+
+def test_trade_rows_are_stored_narrow(dataset):
+    dtypes = dataset.trade_rows.dtypes
+    assert dtypes["Offered"] == np.int16
+    assert dtypes["Balance 30 %"] == np.int32
+    assert dtypes["Received according to portal Total"] == np.float32
+
+
+def test_totals_do_not_overflow_the_stored_dtypes(dataset):
+    views = build_company_views(dataset)
+    company, combined = views["PTPL"].kpis, views["Combined"].kpis
+    assert company["offered"] == OFFERED * TRADES_PER_COMPANY
+    assert combined["offered"] == OFFERED * TRADES_PER_COMPANY * 2
+    assert company["balance_30"] == BALANCE_30 * TRADES_PER_COMPANY
+    assert combined["balance_30"] == BALANCE_30 * TRADES_PER_COMPANY * 2
+    assert combined["total_received"] == pytest.approx(RECEIVED * TRADES_PER_COMPANY * 2, abs=0.005)
+    assert all(not view.kpi_mismatches for view in views.values())
+
+
+def test_a_wrong_total_row_is_flagged(tmp_path):
+    views = build_company_views(processing.process_workbook(_write_workbook(tmp_path / "wrong.xlsx", grand_total_offset=10)))
+    assert dict(views["Combined"].kpi_mismatches) == {"offered": (OFFERED * TRADES_PER_COMPANY * 2, OFFERED * TRADES_PER_COMPANY * 2 + 10)}
+    assert not views["PTPL"].kpi_mismatches
@@ -0,0 +1,187 @@
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+
+COMPANY_OPTIONS = ["Combined", "PTPL", "VTL", "ITI"]
+
+RUPEES, RUPEES_DF = "₹{:,.2f}", "₹ %.2f"
+
+# How per-company values combine into the Combined view, so Combined needs no second pass over the rows.
+_ROLLUP = {"sum": "sum", "count": "sum", "min": "min", "max": "max"}
+
+
+@dataclass(frozen=True)
+class MetricSpec:
+    """A KPI: ``source`` is a col_map key (or a column of the frame when it is not one), reduced by ``aggregation``."""
+    key: str
+    label: str
+    group: str
+    source: str
+    aggregation: str = "sum"
+    metric_format: str = "{:,.0f}"
+    df_format: str = "%d"
+
+    def __post_init__(self):
+        if self.aggregation not in _ROLLUP:
+            raise ValueError(f"Unsupported aggregation '{self.aggregation}' for metric '{self.key}'; use one of {sorted(_ROLLUP)}.")
+
+
+# Adding a KPI card is one line here: it gets a card in its group, a column in the trade
+# table, a breakdown, a cross-check against the workbook's total rows and a history column.
+KPI_METRICS = (
+    MetricSpec("total_received", "Total Payments Received", "Key Financials 💰", "total_received", metric_format=RUPEES, df_format=RUPEES_DF),
+    MetricSpec("total_pending", "Total Pending Amount", "Key Financials 💰", "total_pending", metric_format=RUPEES, df_format=RUPEES_DF),
+    MetricSpec("offered", "Total Offered", "Logistics & Operations 📦", "offered"),
+    MetricSpec("delivery", "Deliveries Made", "Logistics & Operations 📦", "delivery"),
+    MetricSpec("pending_delivery", "Items Pending Delivery", "Logistics & Operations 📦", "pending_delivery"),
+    MetricSpec("payment_30_amount", "Sum of 30% Payments", "Payment Status (30% Advance)", "payment_30_amount", metric_format=RUPEES, df_format=RUPEES_DF),
+    MetricSpec("balance_30", "Balance 30%", "Payment Status (30% Advance)", "balance_30", metric_format=RUPEES, df_format=RUPEES_DF),
+    MetricSpec("payment_30_count", "30% Payment Count", "Payment Status (30% Advance)", "payment_30_count"),
+    MetricSpec("payment_70_amount", "Sum of 70% Payments", "Payment Status (70% Balance)", "payment_70_amount", metric_format=RUPEES, df_format=RUPEES_DF),
+    MetricSpec("balance_70", "Balance 70%", "Payment Status (70% Balance)", "balance_70", metric_format=RUPEES, df_format=RUPEES_DF),
+    MetricSpec("balance_count", "Overall Balance Count", "Payment Status (70% Balance)", "balance_count"),
+)
+
+# Tab 3's "Overall 30% Payment Status", over the melted location table.
+LOCATION_METRICS = (
+    MetricSpec("received_count", "Total 30% Payments Received (Count)", "Overall 30% Payment Status", "Received Count"),
+    MetricSpec("pending_count", "Total 30% Payments Pending (Count)", "Overall 30% Payment Status", "Pending Count"),
+    MetricSpec("pending_amount", "Total Pending Amount (30%)", "Overall 30% Payment Status", "Pending Amount", metric_format=RUPEES, df_format=RUPEES_DF),
+)
+
+KPI_GROUPS = {}
+for _spec in KPI_METRICS:
+    KPI_GROUPS.setdefault(_spec.group, []).append(_spec)
+del _spec
+
+KPI_KEYS = [spec.key for spec in KPI_METRICS]
+
+LOCATION_TABLE_COLUMNS = ['Location', 'Received Count', 'Pending Count', 'Pending Amount']
+
+
+@dataclass(frozen=True)
+class CompanyView:
+    """Everything the dashboard renders for one selector value, computed once per dataset.
+
+    Views are cached and shared between sessions, so the frames must be treated as read-only.
+    """
+    name: str
+    col_map: Mapping[str, Optional[str]]
+    kpis: Optional[Mapping[str, float]]  # None when the workbook has neither trade rows nor a total row for this view
+    trades: pd.DataFrame
+    locations: pd.DataFrame
+    location_totals: Mapping[str, float]
+    location_rows: pd.DataFrame  # LOCATION_TABLE_COLUMNS of every location row, sorted by Pending Count
+    location_tables: Mapping[object, np.ndarray]  # trade label -> positions of its rows in location_rows
+    # KPI key -> (value from the trade rows, value in the workbook's total row), where they disagree
+    kpi_mismatches: Mapping[str, tuple]
+
+    def location_table(self, trade_name):
+        positions = self.location_tables.get(trade_name)
+        return None if positions is None else self.location_rows.iloc[positions]
+
+
+def _summary_label(view_name):
+    return "grand total" if view_name == "Combined" else f"{view_name.lower()} total"
+
+
+def _widen(series):
+    # compact_dtypes stores the narrowest type that holds each value, not their total: summing
+    # in int16/int32 would wrap and float32 would lose rupees, so metrics are computed in 64 bits.
+    if pd.api.types.is_integer_dtype(series) or pd.api.types.is_bool_dtype(series):
+        return series.astype("int64")
+    return pd.to_numeric(series, errors="coerce").astype("float64")
+
+
+def _metric_frame(frame, specs, col_map):
+    # One 64-bit column per spec, named by key; a source the workbook does not have reads as 0.
+    columns = {spec.key: (col_map or {}).get(spec.source, spec.source) for spec in specs}
+    return pd.DataFrame(
+        {key: _widen(frame[column]) if column in frame.columns else 0 for key, column in columns.items()}, index=frame.index
+    )
+
+
+def aggregate_metrics(frame, specs, col_map=None):
+    """Reduce ``frame`` to one value per spec, as a {key: value} mapping."""
+    values = _metric_frame(frame, specs, col_map)
+    return MappingProxyType(values.agg({spec.key: spec.aggregation for spec in specs}).to_dict())
+
+
+def company_metrics(trade_rows, col_map, specs=KPI_METRICS):
+    """Every metric for every company, plus a "Combined" row, from one groupby over the trade rows."""
+    values = _metric_frame(trade_rows, specs, col_map)
+    companies = trade_rows[col_map["company"]].astype(str)
+    per_company = values.groupby(companies, sort=False).agg({spec.key: spec.aggregation for spec in specs})
+    # Rolled up column by column, so each keeps its dtype.
+    combined = pd.DataFrame({spec.key: [per_company[spec.key].agg(_ROLLUP[spec.aggregation])] for spec in specs}, index=["Combined"])
+    return pd.concat([per_company, combined])
+
+
+def total_row_mismatches(metrics, total_rows, col_map, specs=KPI_METRICS):
+    """Compare ``metrics`` (from company_metrics) with the workbook's "<company> total" and "grand total" rows.
+
+    Returns {view name: {key: (computed, workbook)}} for the values that differ by more than
+    rounding; views without a total row are not checked.
+    """
+    # The first total row per label wins.
+    summary = total_rows.drop_duplicates('cleaned_company_label').set_index('cleaned_company_label')
+    workbook = _metric_frame(summary, specs, col_map).reindex([_summary_label(name) for name in metrics.index])
+    workbook.index = metrics.index
+    computed = metrics.astype("float64")
+    expected = workbook.astype("float64")
+    differs = ~np.isclose(computed, expected, rtol=1e-9, atol=0.005) & expected.notna().to_numpy()
+    mismatches = {}
+    for row, column in zip(*np.nonzero(differs)):
+        name, key = metrics.index[row], metrics.columns[column]
+        mismatches.setdefault(name, {})[key] = (metrics.iat[row, column], workbook.iat[row, column])
+    return mismatches
+
+
+def build_company_views(dataset):
+    total_rows, trade_rows, col_map, location_final = dataset[:4]
+    # KPIs are computed from the trade rows; the workbook's own total rows are only a cross-check.
+    metrics = company_metrics(trade_rows, col_map)
+    # A company with a total row but no trade rows gets zeros, which the cross-check then flags.
+    total_labels = set(total_rows['cleaned_company_label'])
+    missing = [name for name in COMPANY_OPTIONS if name not in metrics.index and _summary_label(name) in total_labels]
+    metrics = metrics.reindex(metrics.index.append(pd.Index(missing)), fill_value=0)
+    mismatches = total_row_mismatches(metrics, total_rows, col_map)
+
+    trades_by_company = dict(tuple(trade_rows.groupby(col_map["company"], sort=False, observed=True)))
+
+    locations = location_final.copy()
+    # Counts may be stored as narrow integers; multiply in float64 so the product cannot overflow.
+    locations['Pending Amount'] = locations['Pending Count'].astype('float64') * pd.to_numeric(locations[col_map['thirty_percent_value']], errors='coerce').astype('float64')
+    locations_by_company = dict(tuple(locations.groupby('Company', sort=False, observed=True)))
+    # Tab 3's "Overall 30% Payment Status" is the total over the whole location table.
+    location_totals = aggregate_metrics(locations, LOCATION_METRICS)
+
+    # Row positions into the frame sorted by Pending Count, grouped by trade.
+    ordered = locations.sort_values(by="Pending Count", ascending=False, kind="stable")
+    location_rows = ordered[LOCATION_TABLE_COLUMNS]
+    tables_by_trade = ordered.groupby('Row Labels', sort=False, observed=True).indices
+    tables_by_company = {}
+    for (company, trade), positions in ordered.groupby(['Company', 'Row Labels'], sort=False, observed=True).indices.items():
+        tables_by_company.setdefault(company, {})[trade] = positions
+
+    views = {}
+    for name in COMPANY_OPTIONS:
+        kpis = None
+        if name in metrics.index:
+            kpis = MappingProxyType({key: metrics.at[name, key] for key in KPI_KEYS})
+        if name == "Combined":
+            # The combined view shows a trade's locations across every company.
+            trades, view_locations, tables = trade_rows, locations, tables_by_trade
+        else:
+            trades = trades_by_company.get(name, trade_rows.iloc[0:0])
+            view_locations = locations_by_company.get(name, locations.iloc[0:0])
+            tables = tables_by_company.get(name, {})
+        views[name] = CompanyView(
+            name, MappingProxyType(dict(col_map)), kpis, trades, view_locations, location_totals, location_rows, MappingProxyType(tables),
+            MappingProxyType(mismatches.get(name, {})),
+        )
+    return views